@@ -5,7 +5,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
 
-from task_5.main import browse_documents
+from task_5.main import browse_documents, K1, B
 
 url_doc = {}
 with open("task_1/index.txt", "r", encoding="utf-8") as f:
@@ -31,6 +31,22 @@ class BrowseDocumentsViewSet(ViewSet):
                 type=OpenApiTypes.INT,
                 description="Количество результатов которое будет возвращено",
             ),
+            OpenApiParameter(
+                "mode",
+                type=OpenApiTypes.STR,
+                enum=["cosine", "bm25"],
+                description="Ранжирование: cosine - косинусная близость TF-IDF (по умолчанию), bm25 - BM25",
+            ),
+            OpenApiParameter(
+                "k1",
+                type=OpenApiTypes.FLOAT,
+                description=f"Параметр k1 BM25 (по умолчанию {K1})",
+            ),
+            OpenApiParameter(
+                "b",
+                type=OpenApiTypes.FLOAT,
+                description=f"Параметр b BM25 от 0 до 1 (по умолчанию {B})",
+            ),
         ],
     )
     @action(detail=False, methods=["get"], url_path="browse-documents")
@@ -52,7 +68,29 @@ class BrowseDocumentsViewSet(ViewSet):
                 {"error": "Поле 'top_n' должно быть числом"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        results = browse_documents(query, top_n)
+        mode = request.query_params.get("mode") or "cosine"
+        if mode not in ("cosine", "bm25"):
+            return Response(
+                {"error": "Поле 'mode' должно быть 'cosine' или 'bm25'"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            k1 = float(request.query_params.get("k1") or K1)
+            b = float(request.query_params.get("b") or B)
+        except ValueError:
+            return Response(
+                {"error": "Поля 'k1' и 'b' должны быть числами"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not 0 <= k1 < float("inf") or not 0 <= b <= 1:
+            return Response(
+                {"error": "Должно быть k1 >= 0 и 0 <= b <= 1"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            results = browse_documents(query, top_n, mode=mode, k1=k1, b=b)
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
         for result in results:
             result["url"] = url_doc[str(result["doc_num"])]
 
@@ -0,0 +1,263 @@
+"""
+Сборка всех этапов: выкачка -> токенизация и лемматизация -> инвертированный индекс
+-> TF-IDF -> поисковые результаты.
+
+Каждый этап запускается в своей папке, как при ручном запуске. Перед запуском считается
+хэш содержимого входных файлов этапа; если он совпадает с сохраненным в .build_state.json
+и выходные файлы на месте, этап пропускается.
+
+Пример: python build.py --workers 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = os.path.join(ROOT_DIR, ".build_state.json")
+
+
+class Stage:
+    """
+    Этап сборки.
+    :param name: Имя этапа.
+    :param cwd: Папка запуска относительно корня репозитория.
+    :param command: Аргументы команды запуска (после интерпретатора python).
+    :param code: Файлы и папки с кодом этапа.
+    :param data: Входные данные этапа (обычно результаты предыдущих этапов).
+    :param outputs: Результаты этапа.
+    :param deps: Этапы, которые должны быть выполнены раньше.
+    :param incremental_command: Команда для обработки только изменившихся данных,
+        если код этапа не менялся с прошлой сборки.
+    :param cacheable: Можно ли пропускать этап по хэшам. Выкачка выполняется всегда:
+        ее вход - сайт, изменения определяет сам краулер по манифесту (ETag, sha256).
+    """
+
+    def __init__(self, name, cwd, command, code, data, outputs, deps=(), incremental_command=None, cacheable=True):
+        self.name = name
+        self.cwd = cwd
+        self.command = command
+        self.code = code
+        self.data = data
+        self.outputs = outputs
+        self.deps = deps
+        self.incremental_command = incremental_command
+        self.cacheable = cacheable
+
+
+def build_stages(workers):
+    tokenize_command = ["main.py", "--workers", str(workers)]
+    return [
+        Stage(
+            name="crawl",
+            cwd="task_1",
+            command=["main.py"],
+            code=["task_1/main.py", "task_1/config.py", "task_1/crawler.py", "task_1/manifest.py",
+                  "task_1/page_store.py", "task_1/urls.py"],
+            data=[],
+            outputs=["task_1/index.txt", "task_1/pages"],
+            cacheable=False,
+        ),
+        Stage(
+            name="tokenize",
+            cwd="task_2",
+            command=tokenize_command,
+            code=["task_2/main.py", "task_2/html_text.py", "task_2/morph_cache.py", "task_2/term_counts.py",
+                  "task_1/page_store.py"],
+            data=["task_1/pages", "task_1/pages.seg", "task_1/pages.idx"],
+            outputs=["task_2/tokens", "task_2/lemmas", "task_2/counts", "task_2/positions", "task_2/processed.json"],
+            deps=["crawl"],
+            incremental_command=tokenize_command + ["--changed-only"],
+        ),
+        Stage(
+            name="index",
+            cwd="task_3",
+            command=["main.py", "--build-only"],
+            code=["task_3/main.py", "task_3/positional_index.py", "task_3/binary_index.py", "task_3/bitmap_engine.py",
+                  "task_3/planner.py", "task_3/query_cache.py", "task_3/lemma_index.py", "task_3/wildcard.py",
+                  "task_2/term_counts.py"],
+            data=["task_2/tokens", "task_2/positions", "task_2/lemmas"],
+            outputs=["task_3/inverted_index.json", "task_3/inverted_index.bin", "task_3/positional_index.json",
+                     "task_3/lemma_index.json"],
+            deps=["tokenize"],
+        ),
+        Stage(
+            name="tf_idf",
+            cwd="task_4",
+            command=["main.py"],
+            code=["task_4/main.py", "task_4/tf_idf_matrix.py", "task_2/term_counts.py", "task_1/page_store.py",
+                  "task_3/lemma_index.py"],
+            data=["task_2/lemmas", "task_2/counts", "task_3/lemma_index.json", "task_1/pages", "task_1/pages.idx"],
+            outputs=["task_4/tokens", "task_4/lemmas", "task_4/matrix"],
+            deps=["index"],
+        ),
+        Stage(
+            name="search",
+            cwd=".",
+            command=["-m", "task_5.main"],
+            code=["task_5/main.py", "task_2/main.py", "task_2/html_text.py", "task_2/morph_cache.py",
+                  "task_3/binary_index.py", "task_3/segments.py", "task_4/tf_idf_matrix.py",
+                  "task_5/cosine_engine.py", "task_5/bm25_engine.py", "task_5/sharded.py"],
+            data=["task_3/inverted_index.json", "task_3/inverted_index.bin", "task_3/lemma_index.json", "task_4/tokens",
+                  "task_4/lemmas", "task_4/matrix"],
+            outputs=["results.txt"],
+            deps=["tf_idf"],
+        ),
+        Stage(
+            name="shards",
+            cwd=".",
+            command=["-m", "task_5.sharded", "--build"],
+            code=["task_5/sharded.py", "task_3/binary_index.py"],
+            data=["task_2/tokens", "task_3/inverted_index.json", "task_3/inverted_index.bin", "task_4/lemmas"],
+            outputs=["task_5/shards"],
+            deps=["tf_idf"],
+        ),
+    ]
+
+
+def iter_files(path):
+    """
+    Перебирает файлы по пути (файл или папка) в детерминированном порядке.
+    """
+    full_path = os.path.join(ROOT_DIR, path)
+    if os.path.isfile(full_path):
+        yield path
+        return
+    for dir_path, dir_names, file_names in os.walk(full_path):
+        dir_names[:] = sorted(name for name in dir_names if name != "__pycache__")
+        for file_name in sorted(file_names):
+            yield os.path.relpath(os.path.join(dir_path, file_name), ROOT_DIR)
+
+
+def hash_paths(paths):
+    """
+    Хэш содержимого файлов вместе с их путями. Отсутствующие пути не учитываются.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        for file_path in iter_files(path):
+            digest.update(file_path.encode("utf-8") + b"\0")
+            with open(os.path.join(ROOT_DIR, file_path), "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(block)
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {}
+    with open(STATE_FILE, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_state(state):
+    with open(STATE_FILE, "w", encoding="utf-8") as file:
+        json.dump(state, file, indent=4)
+
+
+def order_stages(stages):
+    """
+    Топологическая сортировка этапов по зависимостям.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    ordered = []
+    visited = set()
+
+    def visit(stage, path=()):
+        if stage.name in path:
+            raise ValueError(f"Циклическая зависимость этапов: {' -> '.join(path + (stage.name,))}")
+        if stage.name in visited:
+            return
+        for dep in stage.deps:
+            visit(by_name[dep], path + (stage.name,))
+        visited.add(stage.name)
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+
+def run_stage(stage, command):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT_DIR, env.get("PYTHONPATH")]))
+    subprocess.run(
+        [sys.executable] + command,
+        cwd=os.path.join(ROOT_DIR, stage.cwd),
+        env=env,
+        check=True,
+    )
+
+
+def build(stages, selected, force=False):
+    """
+    Выполняет выбранные этапы по порядку зависимостей.
+    :param stages: Список этапов.
+    :param selected: Имена этапов, которые нужно выполнить.
+    :param force: Выполнить этапы, даже если входные данные не изменились.
+    :return: Список кортежей (этап, статус, время в секундах).
+    """
+    state = load_state()
+    report = []
+
+    for stage in order_stages(stages):
+        if stage.name not in selected:
+            continue
+
+        start = time.perf_counter()
+        code_hash = hash_paths(stage.code)
+        data_hash = hash_paths(stage.data)
+        previous = state.get(stage.name, {})
+        outputs_exist = all(os.path.exists(os.path.join(ROOT_DIR, path)) for path in stage.outputs)
+
+        if (not force and stage.cacheable and outputs_exist and previous.get("code") == code_hash
+                and previous.get("data") == data_hash):
+            report.append((stage.name, "пропущен", time.perf_counter() - start))
+            continue
+
+        # Если код этапа не менялся, достаточно обработать изменившиеся данные
+        command = stage.command
+        status = "выполнен"
+        if not force and stage.incremental_command and outputs_exist and previous.get("code") == code_hash:
+            command = stage.incremental_command
+            status = "выполнен инкрементально"
+
+        print(f"== {stage.name}: python {' '.join(command)}")
+        run_stage(stage, command)
+
+        # Хэш данных пересчитывается после выполнения: этап мог изменить собственные входы
+        state[stage.name] = {"code": code_hash, "data": hash_paths(stage.data)}
+        save_state(state)
+        report.append((stage.name, status, time.perf_counter() - start))
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сборка поискового индекса")
+    parser.add_argument(
+        "stages",
+        nargs="*",
+        help="этапы для выполнения (по умолчанию все, кроме выкачки): crawl, tokenize, index, tf_idf, search, shards",
+    )
+    parser.add_argument("--crawl", action="store_true", help="выполнить также выкачку страниц")
+    parser.add_argument("--force", action="store_true", help="выполнить этапы без проверки хэшей")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="процессов для токенизации")
+    args = parser.parse_args()
+
+    stages = build_stages(args.workers)
+    selected = set(args.stages) or {stage.name for stage in stages if stage.name != "crawl"}
+    if args.crawl:
+        selected.add("crawl")
+
+    report = build(stages, selected, force=args.force)
+
+    print("\nЭтап              Статус                     Время, с")
+    for name, status, elapsed in report:
+        print(f"{name:<17} {status:<26} {elapsed:8.2f}")
+    print(f"{'итого':<17} {'':<26} {sum(item[2] for item in report):8.2f}")
@@ -0,0 +1,294 @@
+"""
+Проверка краулера на локальном сервере http.server, без обращения к настоящему сайту.
+
+Проверяются повторы с экспоненциальной задержкой, ограничение задержки из Retry-After,
+ограничение одновременных запросов к одному хосту, лимит частоты запросов, сжатие сегмента
+хранилища страниц и полный обход main.py с --base-url во временной папке.
+
+Пример: python check_crawler.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
+
+import requests
+
+from config import START_PATH
+from crawler import Crawler
+from page_store import (
+    PageStore,
+    PageStoreWriter,
+    count_documents,
+    index_path,
+    read_index_entries,
+    segment_path,
+    write_index_entries,
+)
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+# Страницы стенда для полного обхода: две подходят по длине и языку, одна слишком короткая
+CONTENT_TEXT = "Гарри Поттер учился в школе чародейства и волшебства Хогвартс вместе с друзьями. " * 150
+PAGES = {
+    "/ru/wiki/Гарри_Поттер": CONTENT_TEXT,
+    "/ru/wiki/Хогвартс": CONTENT_TEXT.replace("Гарри Поттер", "Гермиона Грейнджер"),
+    "/ru/wiki/Заглушка": "Короткая страница.",
+}
+
+
+class StandServer(ThreadingHTTPServer):
+    """
+    Сервер стенда: считает запросы по путям и одновременные запросы по хостам.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandHandler)
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.active = Counter()
+        self.max_active = Counter()
+        self.max_total = 0
+        self.arrivals = []
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset(self):
+        with self.lock:
+            self.requests.clear()
+            self.max_active.clear()
+            self.max_total = 0
+            self.arrivals.clear()
+
+
+class StandHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        path = unquote(urlsplit(self.path).path)
+        host = self.headers.get("Host")
+        with server.lock:
+            server.requests[path] += 1
+            count = server.requests[path]
+            server.active[host] += 1
+            server.max_active[host] = max(server.max_active[host], server.active[host])
+            server.max_total = max(server.max_total, sum(server.active.values()))
+            server.arrivals.append(time.monotonic())
+        try:
+            self.route(path, count)
+        finally:
+            with server.lock:
+                server.active[host] -= 1
+
+    def route(self, path, count):
+        # /flaky - две ошибки 503, затем ответ; /down - всегда 503
+        if path == "/flaky":
+            self.reply(503 if count <= 2 else 200)
+        elif path == "/down":
+            self.reply(503)
+        # Первый ответ просит подождать час (в секундах или датой), второй - успешный
+        elif path in ("/retry-after", "/retry-after-date") and count == 1:
+            if path == "/retry-after":
+                self.reply(429, headers={"Retry-After": "3600"})
+            else:
+                self.reply(503, headers={"Retry-After": formatdate(time.time() + 3600, usegmt=True)})
+        elif path in ("/retry-after", "/retry-after-date"):
+            self.reply(200)
+        elif path.startswith("/slow/"):
+            time.sleep(0.2)
+            self.reply(200)
+        elif path.startswith("/fast/"):
+            self.reply(200)
+        elif path == START_PATH:
+            links = "".join(f'<a href="{quote(page)}">{page}</a>' for page in PAGES)
+            self.reply(200, f'<html><body>{links}<a href="https://example.com/">внешняя</a></body></html>')
+        elif path in PAGES:
+            etag = f'"{len(PAGES[path])}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.reply(304, "", {"ETag": etag})
+            else:
+                self.reply(200, f"<html><body><p>{PAGES[path]}</p></body></html>", {"ETag": etag})
+        else:
+            self.reply(404)
+
+    def reply(self, status, body="ok", headers=None):
+        content = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def check(results, condition, message):
+    print(f"{'OK  ' if condition else 'FAIL'} {message}")
+    results.append(condition)
+
+
+def check_retries(server, results):
+    server.reset()
+    with Crawler(max_retries=3, backoff_factor=0.1, rate_limit=0) as crawler:
+        start = time.monotonic()
+        response = crawler.fetch(server.base_url + "/flaky")
+        elapsed = time.monotonic() - start
+    check(results, response.status_code == 200 and server.requests["/flaky"] == 3,
+          f"повтор после 503: {server.requests['/flaky']} запроса, ответ {response.status_code}")
+    check(results, elapsed >= 0.1 + 0.2, f"экспоненциальная задержка между повторами: {elapsed:.2f} с")
+
+    with Crawler(max_retries=2, backoff_factor=0.01, rate_limit=0) as crawler:
+        try:
+            crawler.fetch(server.base_url + "/down")
+            failed = False
+        except requests.exceptions.HTTPError:
+            failed = True
+    check(results, failed and server.requests["/down"] == 3,
+          f"после исчерпания повторов - ошибка: {server.requests['/down']} запроса")
+
+
+def check_retry_after(server, results):
+    server.reset()
+    with Crawler(max_retries=1, rate_limit=0, max_retry_after=0.5) as crawler:
+        for path in ("/retry-after", "/retry-after-date"):
+            start = time.monotonic()
+            response = crawler.fetch(server.base_url + path)
+            elapsed = time.monotonic() - start
+            check(results, response.status_code == 200 and 0.5 <= elapsed < 5,
+                  f"Retry-After {path} ограничен max_retry_after: {elapsed:.2f} с")
+
+
+def check_host_limit(server, results):
+    server.reset()
+    port = server.server_address[1]
+    # 127.0.0.1 и localhost - разные хосты для краулера, у каждого свое ограничение
+    urls = [f"http://{host}:{port}/slow/{number}" for number in range(6) for host in ("127.0.0.1", "localhost")]
+    with Crawler(max_workers=8, max_per_host=2, rate_limit=0) as crawler:
+        statuses = [response.status_code for _, response, _ in crawler.fetch_all(urls) if response is not None]
+    peaks = dict(server.max_active)
+    check(results, len(statuses) == len(urls) and all(peak <= 2 for peak in peaks.values()),
+          f"не больше 2 одновременных запросов к хосту: {peaks}")
+    check(results, server.max_total > 2, f"разные хосты загружаются параллельно: {server.max_total} одновременно")
+
+
+def check_rate_limit(server, results):
+    server.reset()
+    urls = [f"{server.base_url}/fast/{number}" for number in range(11)]
+    with Crawler(max_workers=4, rate_limit=20) as crawler:
+        list(crawler.fetch_all(urls))
+    span = max(server.arrivals) - min(server.arrivals)
+    # 11 запросов при 20 запросах в секунду занимают не меньше 10 интервалов по 0.05 с
+    check(results, span >= 0.45, f"лимит 20 запросов в секунду: 11 запросов за {span:.2f} с")
+
+
+def check_compaction(results):
+    with tempfile.TemporaryDirectory() as directory:
+        prefix = os.path.join(directory, "pages")
+        with PageStoreWriter(prefix) as writer:
+            for doc_id in range(1, 4):
+                writer.add(doc_id, f"версия 1 документа {doc_id} " * 100)
+        # Вторая и третья версии документов 1 и 2 оставляют в сегменте больше половины замененных записей
+        for version in (2, 3):
+            with PageStoreWriter(prefix) as writer:
+                for doc_id in (1, 2):
+                    writer.add(doc_id, f"версия {version} документа {doc_id} " * 100)
+        live = sum(length for _, length in read_index_entries(prefix).values())
+        size = os.path.getsize(segment_path(prefix))
+        with PageStore(prefix) as store:
+            versions = [store.get(doc_id).split()[1] for doc_id in range(1, 4)]
+        check(results, size == live and versions == ["3", "3", "1"],
+              f"сегмент сжат до актуальных версий: {size} байт, версии {versions}")
+
+
+def run_main(server, directory, results):
+    process = subprocess.run([sys.executable, MAIN_SCRIPT, "--base-url", server.base_url], cwd=directory,
+                             capture_output=True, text=True)
+    check(results, process.returncode == 0, f"main.py --base-url завершился с кодом {process.returncode}")
+    if process.returncode != 0:
+        print(process.stderr)
+    return process.returncode == 0
+
+
+def check_main(server, results):
+    with tempfile.TemporaryDirectory() as directory:
+        if not run_main(server, directory, results):
+            return
+        with open(os.path.join(directory, "index.txt"), "r", encoding="utf-8") as file:
+            urls = sorted(unquote(line.split()[1]) for line in file)
+        expected = sorted(server.base_url + page for page in PAGES if page != "/ru/wiki/Заглушка")
+        check(results, urls == expected, f"в index.txt только страницы с текстом: {len(urls)}")
+
+        # Повторный обход получает 304 на все страницы, хранилище должно сохранить все документы
+        pages = os.path.join(directory, "pages")
+        if not run_main(server, directory, results):
+            return
+        count = count_documents(pages, pages)
+        check(results, count == len(expected), f"после обхода без изменений в хранилище {count} документа")
+
+        # Хранилище, которого еще нет при выкачанных страницах, собирается из папки pages
+        for path in (segment_path(pages), index_path(pages)):
+            os.remove(path)
+        if not run_main(server, directory, results):
+            return
+        count = count_documents(pages, pages)
+        check(results, count == len(expected), f"уже выкачанные страницы упакованы в хранилище: {count} документа")
+
+        # Документ, которого нет ни в хранилище, ни в папке pages, скачивается заново без условного запроса
+        entries = read_index_entries(pages)
+        doc_id = min(entries)
+        del entries[doc_id]
+        write_index_entries(pages, entries)
+        os.remove(os.path.join(pages, f"{doc_id}.html"))
+        if not run_main(server, directory, results):
+            return
+        count = count_documents(pages, pages)
+        check(results, count == len(expected), f"отсутствующий в хранилище документ скачан заново: {count} документа")
+
+        # Манифест сохраняется, даже если индекс хранилища не записан: документ манифеста удален с сайта
+        manifest_path = os.path.join(directory, "manifest.json")
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+        url = sorted(manifest["documents"])[0]
+        manifest["documents"][url]["etag"] = '"stale"'
+        manifest["documents"][server.base_url + "/ru/wiki/Удалена"] = {
+            "doc_id": 100, "etag": None, "last_modified": None, "sha256": None,
+        }
+        with open(manifest_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+        process = subprocess.run([sys.executable, MAIN_SCRIPT, "--base-url", server.base_url], cwd=directory,
+                                 capture_output=True, text=True)
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            etag = json.load(file)["documents"][url]["etag"]
+        check(results, process.returncode != 0 and etag != '"stale"',
+              f"манифест сохранен при ошибке записи индекса: код {process.returncode}, ETag {etag}")
+
+
+if __name__ == "__main__":
+    stand = StandServer()
+    threading.Thread(target=stand.serve_forever, daemon=True).start()
+    outcomes = []
+    try:
+        check_retries(stand, outcomes)
+        check_retry_after(stand, outcomes)
+        check_host_limit(stand, outcomes)
+        check_rate_limit(stand, outcomes)
+        check_compaction(outcomes)
+        check_main(stand, outcomes)
+    finally:
+        stand.shutdown()
+    print(f"Пройдено проверок: {sum(outcomes)} из {len(outcomes)}")
+    sys.exit(0 if all(outcomes) else 1)
@@ -1,5 +1,22 @@
+# Адрес сайта по умолчанию; для проверки на локальном сервере передается main.py --base-url
 BASE_URL = "https://harrypotter.fandom.com"
-SEARCH_URL = f"{BASE_URL}/ru/wiki/Портал:Старт"
+START_PATH = "/ru/wiki/Портал:Старт"  # Страница со ссылками на документы (относительно BASE_URL)
+SEARCH_URL = f"{BASE_URL}{START_PATH}"
 
 MIN_TEXT_LENGTH = 10000
 TARGET_LANGUAGE = "ru"
+LANG_SAMPLE_LENGTH = 2000  # Длина фрагмента текста для определения языка
+
+# Параметры краулера
+MAX_WORKERS = 8  # Количество потоков загрузки (1 - последовательный обход)
+MAX_CONNECTIONS_PER_HOST = 4  # Ограничение одновременных запросов к одному хосту
+REQUEST_TIMEOUT = 10  # Таймаут запроса в секундах
+MAX_RETRIES = 3  # Количество повторных попыток при ошибке
+BACKOFF_FACTOR = 0.5  # Задержка перед повтором: BACKOFF_FACTOR * 2 ** попытка
+RETRY_STATUSES = {429, 500, 502, 503, 504}  # Коды ответа, при которых запрос повторяется
+MAX_RETRY_AFTER = 60  # Наибольшая задержка в секундах, которую может запросить сервер заголовком Retry-After
+RATE_LIMIT = 10  # Максимум запросов в секунду (0 - без ограничения)
+
+# Хранилище страниц: сжатые записи в pages.seg и индекс смещений в pages.idx
+PAGE_STORE_PREFIX = "pages"
+SAVE_LOOSE_PAGES = True  # Дополнительно сохранять каждую страницу в отдельный файл pages/{номер}.html
@@ -0,0 +1,159 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from config import (
+    MAX_WORKERS,
+    MAX_CONNECTIONS_PER_HOST,
+    REQUEST_TIMEOUT,
+    MAX_RETRIES,
+    BACKOFF_FACTOR,
+    RETRY_STATUSES,
+    MAX_RETRY_AFTER,
+    RATE_LIMIT,
+)
+
+
+class RateLimiter:
+    """
+    Ограничивает общее число запросов в секунду для всех потоков.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_time = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def parse_retry_after(value):
+    """
+    Задержка в секундах из заголовка Retry-After: число секунд или дата HTTP.
+    :return: Неотрицательное число секунд или None, если заголовка нет или он не разобран.
+    """
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+class Crawler:
+    """
+    Загружает страницы пулом потоков через общую сессию с keep-alive.
+    Число одновременных запросов к одному хосту ограничено,
+    неудачные запросы повторяются с экспоненциальной задержкой.
+    """
+
+    def __init__(
+        self,
+        max_workers=MAX_WORKERS,
+        max_per_host=MAX_CONNECTIONS_PER_HOST,
+        timeout=REQUEST_TIMEOUT,
+        max_retries=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        rate_limit=RATE_LIMIT,
+        max_retry_after=MAX_RETRY_AFTER,
+    ):
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_retry_after = max_retry_after
+        self.rate_limiter = RateLimiter(rate_limit)
+
+        # Пул соединений на хост не меньше допустимого числа одновременных запросов
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_per_host)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.host_semaphores = {}
+        self.host_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def _host_semaphore(self, url):
+        host = urlsplit(url).netloc
+        with self.host_lock:
+            if host not in self.host_semaphores:
+                self.host_semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self.host_semaphores[host]
+
+    def _retry_delay(self, attempt, response=None):
+        # Учитываем заголовок Retry-After (секунды или дата), если сервер его прислал,
+        # но ждем не дольше max_retry_after
+        if response is not None:
+            delay = parse_retry_after(response.headers.get("Retry-After", ""))
+            if delay is not None:
+                return min(delay, self.max_retry_after)
+        return self.backoff_factor * 2 ** attempt
+
+    def fetch(self, url, headers=None):
+        """
+        Выполняет GET-запрос с повторами.
+        :param url: Адрес страницы.
+        :param headers: Дополнительные заголовки запроса.
+        :return: Объект ответа requests.Response.
+        """
+        semaphore = self._host_semaphore(url)
+        attempt = 0
+        while True:
+            self.rate_limiter.wait()
+            try:
+                with semaphore:
+                    response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(attempt))
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                time.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+    def _fetch_safe(self, url, headers_for=None):
+        try:
+            headers = headers_for(url) if headers_for else None
+            return url, self.fetch(url, headers=headers), None
+        except requests.exceptions.RequestException as e:
+            return url, None, e
+
+    def fetch_all(self, urls, headers_for=None):
+        """
+        Загружает страницы параллельно.
+        :param urls: Список адресов.
+        :param headers_for: Функция, возвращающая заголовки запроса для адреса.
+        :return: Генератор кортежей (url, ответ, ошибка) в порядке входного списка.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            yield from executor.map(lambda url: self._fetch_safe(url, headers_for), urls)
@@ -1,11 +1,33 @@
+import argparse
 import os
-import requests
-from urls import find_content_links
-from config import BASE_URL, SEARCH_URL
-
-
-# Поиск ссылок на странице
-urls = find_content_links(BASE_URL, SEARCH_URL)
+from crawler import Crawler
+from manifest import (
+    load_manifest,
+    save_manifest,
+    conditional_headers,
+    update_entry,
+    write_index,
+)
+from page_store import PageStoreWriter, pack_pages, store_exists
+from urls import find_candidate_links, is_content_page
+from config import BASE_URL, START_PATH, PAGE_STORE_PREFIX, SAVE_LOOSE_PAGES
+
+
+parser = argparse.ArgumentParser(description="Выкачка страниц сайта")
+parser.add_argument("--base-url", default=BASE_URL,
+                    help="адрес сайта, например локального сервера для проверки (по умолчанию %(default)s)")
+parser.add_argument("--start-path", default=START_PATH,
+                    help="страница со ссылками на документы относительно --base-url")
+args = parser.parse_args()
+
+base_url = args.base_url.rstrip("/")
+search_url = base_url + args.start_path
+
+# Общий краулер с пулом соединений для всех запросов
+crawler = Crawler()
+
+# Поиск ссылок на странице (сортируем, чтобы номера новых документов не зависели от порядка множества)
+urls = sorted(find_candidate_links(base_url, search_url, crawler))
 
 print(f"Найдено {len(urls)} ссылок.")
 
@@ -17,34 +39,68 @@ os.makedirs(output_dir, exist_ok=True)
 # Файл для хранения индекса
 index_file = "index.txt"
 
-
-# Очистка файла index.txt перед началом работы
-open(index_file, "w").close()
-
-# Счетчик для нумерации файлов
-file_counter = 1
-
-# Проходим по каждой ссылке
-for url in urls:
-    try:
-        # Отправляем GET-запрос к странице
-        response = requests.get(url)
-        response.raise_for_status()  # Проверяем статус ответа
-
-        # Сохраняем содержимое страницы в файл
-        filename = f"{file_counter}.html"
-        with open(os.path.join(output_dir, filename), "w", encoding="utf-8") as output:
-            output.write(response.text)
-
-        # Записываем номер файла и ссылку в index.txt
-        with open(index_file, "a", encoding="utf-8") as index:
-            index.write(f"{file_counter} {url}\n")
-
+# Манифест обхода: номера документов, ETag/Last-Modified и хэши содержимого
+manifest = load_manifest(index_file=index_file, pages_dir=output_dir)
+
+# Номера документов, содержимое которых изменилось
+changed = []
+
+# Хранилище сжатых страниц. Уже выкачанные страницы сначала упаковываются в него,
+# чтобы хранилище содержало все известные документы, а не только измененные при этом обходе
+if not store_exists(PAGE_STORE_PREFIX) and any(name.endswith(".html") for name in os.listdir(output_dir)):
+    pack_pages(output_dir, PAGE_STORE_PREFIX)
+page_store = PageStoreWriter(
+    PAGE_STORE_PREFIX, required_doc_ids=[entry["doc_id"] for entry in manifest["documents"].values()]
+)
+page_store.add_missing_pages(output_dir)
+
+# Каждая страница скачивается один раз: проверяется и сразу сохраняется.
+# Для уже известных страниц отправляется условный запрос, кроме документов, которых нет в хранилище
+# (например, после обхода, при котором индекс хранилища не был записан): они скачиваются заново
+def request_headers(url):
+    entry = manifest["documents"].get(url)
+    if entry is not None and entry["doc_id"] not in page_store:
+        return {}
+    return conditional_headers(manifest, url)
+
+
+try:
+    for url, response, error in crawler.fetch_all(urls, headers_for=request_headers):
+        if error is not None:
+            print(f"Ошибка скачивания {url}: {error}")
+            continue
+
+        # Страница не изменилась с прошлого обхода
+        if response.status_code == 304:
+            continue
+
+        # Пропускаем короткие страницы и страницы на другом языке
+        if not is_content_page(response.text):
+            continue
+
+        doc_id, is_changed = update_entry(manifest, url, response)
+        if not is_changed and doc_id in page_store:
+            continue
+
+        # Сохраняем содержимое страницы в хранилище и, при необходимости, в отдельный файл
+        page_store.add(doc_id, response.text)
+        filename = f"{doc_id}.html"
+        if SAVE_LOOSE_PAGES:
+            with open(os.path.join(output_dir, filename), "w", encoding="utf-8") as output:
+                output.write(response.text)
+
+        changed.append(doc_id)
         print(f"Скачан: {url} -> {filename}")
-        file_counter += 1
-
-    except Exception as e:
-        print(f"Ошибка скачивания {url}: {e}")
-
-
-print("Скачивание завершено")
+finally:
+    crawler.close()
+    # Манифест сохраняется и при ошибке (в том числе если индекс хранилища не записан),
+    # чтобы ETag и хэши уже скачанных страниц не терялись
+    try:
+        page_store.close()
+    finally:
+        # Записываем номера файлов и ссылки в index.txt и сохраняем манифест
+        manifest["changed"] = sorted(changed)
+        write_index(manifest, index_file)
+        save_manifest(manifest)
+
+print(f"Скачивание завершено, изменено документов: {len(changed)}")
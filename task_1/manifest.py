@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+
+
+MANIFEST_FILE = "manifest.json"
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_manifest(path=MANIFEST_FILE, index_file="index.txt", pages_dir="pages"):
+    """
+    Загружает манифест обхода. Если манифеста еще нет, строит его
+    по index.txt и уже скачанным страницам, сохраняя их номера.
+    :param path: Путь к файлу манифеста.
+    :param index_file: Файл с номерами документов и ссылками.
+    :param pages_dir: Папка с выкачанными страницами.
+    :return: Словарь {"documents": {url: запись}, "changed": [номера документов]}.
+    """
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    documents = {}
+    if os.path.exists(index_file):
+        with open(index_file, "r", encoding="utf-8") as file:
+            for line in file:
+                doc_id, url = line.split()
+                page_path = os.path.join(pages_dir, f"{doc_id}.html")
+                sha256 = None
+                if os.path.exists(page_path):
+                    with open(page_path, "r", encoding="utf-8") as page:
+                        sha256 = content_hash(page.read())
+                documents[url] = {
+                    "doc_id": int(doc_id),
+                    "etag": None,
+                    "last_modified": None,
+                    "sha256": sha256,
+                }
+
+    return {"documents": documents, "changed": []}
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=4)
+
+
+def conditional_headers(manifest, url):
+    """
+    Заголовки условного запроса для ранее скачанной страницы.
+    """
+    entry = manifest["documents"].get(url)
+    headers = {}
+    if entry is None:
+        return headers
+    if entry["etag"]:
+        headers["If-None-Match"] = entry["etag"]
+    if entry["last_modified"]:
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def next_doc_id(manifest):
+    return max((entry["doc_id"] for entry in manifest["documents"].values()), default=0) + 1
+
+
+def update_entry(manifest, url, response):
+    """
+    Обновляет запись о странице по ответу сервера.
+    Новые страницы получают следующий свободный номер, известные сохраняют свой.
+    :return: Кортеж (номер документа, изменилось ли содержимое).
+    """
+    documents = manifest["documents"]
+    sha256 = content_hash(response.text)
+
+    entry = documents.get(url)
+    if entry is None:
+        entry = {"doc_id": next_doc_id(manifest), "etag": None, "last_modified": None, "sha256": None}
+        documents[url] = entry
+
+    changed = entry["sha256"] != sha256
+    entry["etag"] = response.headers.get("ETag")
+    entry["last_modified"] = response.headers.get("Last-Modified")
+    entry["sha256"] = sha256
+
+    return entry["doc_id"], changed
+
+
+def write_index(manifest, index_file="index.txt"):
+    """
+    Перезаписывает index.txt по манифесту в порядке номеров документов.
+    """
+    entries = sorted((entry["doc_id"], url) for url, entry in manifest["documents"].items())
+    with open(index_file, "w", encoding="utf-8") as index:
+        for doc_id, url in entries:
+            index.write(f"{doc_id} {url}\n")
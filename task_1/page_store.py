@@ -0,0 +1,278 @@
+import mmap
+import os
+import re
+import struct
+import zlib
+
+
+# Заголовок индекса: сигнатура и количество записей
+INDEX_MAGIC = b"OIPPAGE1"
+INDEX_HEADER = struct.Struct("<8sI")
+# Запись индекса: номер документа, смещение и длина сжатой записи в файле сегмента
+INDEX_ENTRY = struct.Struct("<IQI")
+
+COMPRESSION_LEVEL = 6
+# Доля сегмента, занятая замененными версиями документов, после которой close() переписывает сегмент
+MAX_DEAD_RATIO = 0.5
+
+
+def segment_path(prefix):
+    return f"{prefix}.seg"
+
+
+def index_path(prefix):
+    return f"{prefix}.idx"
+
+
+def store_exists(prefix):
+    return os.path.exists(index_path(prefix))
+
+
+def read_index_entries(prefix):
+    """
+    Читает индекс хранилища.
+    :return: Словарь номер документа -> (смещение, длина).
+    """
+    entries = {}
+    with open(index_path(prefix), "rb") as file:
+        data = file.read()
+    magic, count = INDEX_HEADER.unpack_from(data, 0)
+    if magic != INDEX_MAGIC:
+        raise ValueError(f"Неизвестный формат индекса: {index_path(prefix)}")
+    for i in range(count):
+        doc_id, offset, length = INDEX_ENTRY.unpack_from(data, INDEX_HEADER.size + i * INDEX_ENTRY.size)
+        entries[doc_id] = (offset, length)
+    return entries
+
+
+def write_index_entries(prefix, entries):
+    """
+    Записывает индекс во временный файл и атомарно подменяет старый.
+    :param entries: Словарь номер документа -> (смещение, длина).
+    """
+    tmp_path = index_path(prefix) + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(INDEX_HEADER.pack(INDEX_MAGIC, len(entries)))
+        for doc_id in sorted(entries):
+            offset, length = entries[doc_id]
+            file.write(INDEX_ENTRY.pack(doc_id, offset, length))
+    os.replace(tmp_path, index_path(prefix))
+
+
+class PageStoreWriter:
+    """
+    Дописывает сжатые страницы в файл сегмента и пересобирает индекс смещений при закрытии.
+    Повторная запись документа заменяет прежнюю версию в индексе; если прежние версии занимают
+    больше MAX_DEAD_RATIO сегмента, при закрытии сегмент переписывается только с актуальными версиями.
+    Индекс, в котором нет какого-либо из обязательных документов, не записывается.
+    """
+
+    def __init__(self, prefix, required_doc_ids=()):
+        """
+        :param prefix: Путь к хранилищу без расширения.
+        :param required_doc_ids: Номера документов, которые должны остаться в хранилище (например, все из манифеста).
+        """
+        self.prefix = prefix
+        self.required_doc_ids = set(required_doc_ids)
+        self.entries = read_index_entries(prefix) if store_exists(prefix) else {}
+        self.segment = open(segment_path(prefix), "ab")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, doc_id, html):
+        record = zlib.compress(html.encode("utf-8"), COMPRESSION_LEVEL)
+        offset = self.segment.tell()
+        self.segment.write(record)
+        self.entries[doc_id] = (offset, len(record))
+
+    def __contains__(self, doc_id):
+        return doc_id in self.entries
+
+    def add_missing_pages(self, pages_dir):
+        """
+        Дописывает обязательные документы, которых нет в хранилище, из файлов {номер}.html папки pages.
+        """
+        for doc_id in sorted(self.required_doc_ids - self.entries.keys()):
+            path = os.path.join(pages_dir, f"{doc_id}.html")
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as file:
+                    self.add(doc_id, file.read())
+
+    def close(self):
+        self.segment.close()
+
+        # Индекс не должен покрывать меньше документов, чем известно: иначе task_2 и task_4
+        # увидели бы только часть коллекции
+        missing = sorted(self.required_doc_ids - self.entries.keys())
+        if missing:
+            raise ValueError(f"В хранилище {self.prefix} нет документов {missing[:10]} (всего {len(missing)}), "
+                             f"индекс не перезаписан")
+
+        if self.dead_ratio() > MAX_DEAD_RATIO:
+            self.compact()
+        write_index_entries(self.prefix, self.entries)
+
+    def dead_ratio(self):
+        """
+        Доля сегмента, не занятая актуальными версиями документов.
+        """
+        size = os.path.getsize(segment_path(self.prefix))
+        if size == 0:
+            return 0.0
+        return 1 - sum(length for _, length in self.entries.values()) / size
+
+    def compact(self):
+        """
+        Переписывает сегмент только с актуальными версиями документов в порядке номеров.
+        Новый сегмент подменяет старый перед записью индекса: при сбое между этими шагами
+        хранилище нужно пересобрать из папки pages (python page_store.py).
+        """
+        tmp_path = segment_path(self.prefix) + ".tmp"
+        entries = {}
+        with open(segment_path(self.prefix), "rb") as source, open(tmp_path, "wb") as target:
+            for doc_id in sorted(self.entries):
+                offset, length = self.entries[doc_id]
+                source.seek(offset)
+                entries[doc_id] = (target.tell(), length)
+                target.write(source.read(length))
+        os.replace(tmp_path, segment_path(self.prefix))
+        self.entries = entries
+
+
+class PageStore:
+    """
+    Чтение страниц из хранилища. Файлы индекса и сегмента отображаются в память,
+    документ находится двоичным поиском по отсортированному индексу.
+    """
+
+    def __init__(self, prefix):
+        with open(index_path(prefix), "rb") as file:
+            self.index = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = INDEX_HEADER.unpack_from(self.index, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Неизвестный формат индекса: {index_path(prefix)}")
+
+        with open(segment_path(prefix), "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            self.segment = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.index.close()
+        if isinstance(self.segment, mmap.mmap):
+            self.segment.close()
+
+    def __len__(self):
+        return self.count
+
+    def _entry(self, position):
+        return INDEX_ENTRY.unpack_from(self.index, INDEX_HEADER.size + position * INDEX_ENTRY.size)
+
+    def _find(self, doc_id):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            entry = self._entry(middle)
+            if entry[0] < doc_id:
+                low = middle + 1
+            elif entry[0] > doc_id:
+                high = middle
+            else:
+                return entry
+        return None
+
+    def _decode(self, offset, length):
+        return zlib.decompress(self.segment[offset:offset + length]).decode("utf-8")
+
+    def __contains__(self, doc_id):
+        return self._find(doc_id) is not None
+
+    def get(self, doc_id):
+        """
+        Возвращает HTML документа по номеру.
+        """
+        entry = self._find(doc_id)
+        if entry is None:
+            raise KeyError(doc_id)
+        return self._decode(entry[1], entry[2])
+
+    def doc_ids(self):
+        return [self._entry(i)[0] for i in range(self.count)]
+
+    def __iter__(self):
+        """
+        Перебирает пары (номер документа, HTML) в порядке номеров.
+        """
+        for i in range(self.count):
+            doc_id, offset, length = self._entry(i)
+            yield doc_id, self._decode(offset, length)
+
+
+def pack_pages(pages_dir, prefix):
+    """
+    Упаковывает папку с выкачанными страницами {номер}.html в хранилище.
+    Существующее хранилище пересобирается заново.
+    """
+    for path in (segment_path(prefix), index_path(prefix)):
+        if os.path.exists(path):
+            os.remove(path)
+
+    with PageStoreWriter(prefix) as writer:
+        for filename in os.listdir(pages_dir):
+            match = re.fullmatch(r"(\d+)\.html", filename)
+            if not match:
+                continue
+            with open(os.path.join(pages_dir, filename), "r", encoding="utf-8") as file:
+                writer.add(int(match.group(1)), file.read())
+
+
+def iter_documents(pages_dir, prefix):
+    """
+    Перебирает пары (номер документа, HTML) в порядке номеров:
+    из хранилища, если оно собрано, иначе из отдельных файлов папки pages.
+    """
+    if store_exists(prefix):
+        with PageStore(prefix) as store:
+            yield from store
+        return
+
+    doc_ids = sorted(
+        int(filename[:-len(".html")]) for filename in os.listdir(pages_dir) if filename.endswith(".html")
+    )
+    for doc_id in doc_ids:
+        with open(os.path.join(pages_dir, f"{doc_id}.html"), "r", encoding="utf-8") as file:
+            yield doc_id, file.read()
+
+
+def read_document(pages_dir, prefix, doc_id):
+    """
+    Возвращает HTML документа по номеру из хранилища или из папки pages.
+    """
+    if store_exists(prefix):
+        with PageStore(prefix) as store:
+            return store.get(doc_id)
+
+    with open(os.path.join(pages_dir, f"{doc_id}.html"), "r", encoding="utf-8") as file:
+        return file.read()
+
+
+def count_documents(pages_dir, prefix):
+    if store_exists(prefix):
+        with PageStore(prefix) as store:
+            return len(store)
+    return len(os.listdir(pages_dir))
+
+
+if __name__ == "__main__":
+    # Упаковка уже выкачанных страниц: python page_store.py
+    pack_pages("pages", "pages")
+    print("Страницы упакованы в pages.seg и pages.idx")
@@ -1,14 +1,18 @@
 import requests
 from bs4 import BeautifulSoup
-from config import MIN_TEXT_LENGTH, TARGET_LANGUAGE
+from config import MIN_TEXT_LENGTH, TARGET_LANGUAGE, LANG_SAMPLE_LENGTH
+from crawler import Crawler
 from langdetect import detect, LangDetectException
 
 
-def find_content_links(base_url, search_url):
+def find_candidate_links(base_url, search_url, crawler=None):
+    if crawler is None:
+        with Crawler() as crawler:
+            return find_candidate_links(base_url, search_url, crawler)
+
     try:
-        # Отправляем GET-запрос к указанному URL
-        response = requests.get(search_url)
-        response.raise_for_status()  # Проверяем статус ответа (например, 404 или 500 ошибки)
+        # Отправляем GET-запрос к указанному URL (повторы и проверка статуса внутри краулера)
+        response = crawler.fetch(search_url)
 
         # Парсим HTML-код страницы с помощью BeautifulSoup
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -23,38 +27,26 @@ def find_content_links(base_url, search_url):
             elif link.startswith(base_url):
                 all_links.append(link)
 
-        all_links = list(set(all_links))
-
-        content_links = []
-        for link in all_links:
-            try:
-                # Загружаем страницу по ссылке
-                response = requests.get(link, timeout=5)
-                response.raise_for_status()
-                page_soup = BeautifulSoup(response.text, 'html.parser')
-
-                # Извлекаем текст со страницы
-                text = page_soup.get_text(strip=True)
+        return list(set(all_links))
 
-                # Проверяем длину текста
-                if len(text) < MIN_TEXT_LENGTH:
-                    continue
-
-                try:
-                    detected_language = detect(text)
-                except LangDetectException:
-                    detected_language = None
+    except requests.exceptions.RequestException as e:
+        print(f"Ошибка при запросе к {search_url}: {e}")
+        return []
 
-                # Если язык совпадает с целевым, добавляем ссылку
-                if detected_language == TARGET_LANGUAGE:
-                    content_links.append(link)
 
-            except requests.exceptions.RequestException as e:
-                print(f"Ошибка при запросе к {link}: {e}")
+def is_content_page(html):
+    # Извлекаем текст со страницы
+    text = BeautifulSoup(html, 'html.parser').get_text(strip=True)
 
-        return content_links
+    # Проверяем длину текста
+    if len(text) < MIN_TEXT_LENGTH:
+        return False
 
-    except requests.exceptions.RequestException as e:
-        print(f"Ошибка при запросе к {search_url}: {e}")
-        return []
+    # Язык определяем по фрагменту текста, а не по всей странице
+    try:
+        detected_language = detect(text[:LANG_SAMPLE_LENGTH])
+    except LangDetectException:
+        detected_language = None
 
+    # Страница подходит, если язык совпадает с целевым
+    return detected_language == TARGET_LANGUAGE
@@ -0,0 +1,116 @@
+from html.parser import HTMLParser
+
+
+# Элементы, содержимое которых не является текстом страницы
+SKIP_TAGS = {
+    "head", "script", "style", "noscript", "template", "svg", "iframe",
+    "nav", "header", "footer", "form", "button", "select",
+}
+
+# Боковые блоки <aside> отбрасываются только как оформление сайта (по классу или роли):
+# карточка статьи Fandom (<aside role="region" class="portable-infobox">) - текст страницы
+CHROME_ASIDE_CLASSES = {"page__right-rail", "wiki-top-articles", "post-details-desktop__right"}
+CHROME_ASIDE_ROLES = {"complementary", "navigation", "banner", "contentinfo"}
+
+# Блочные элементы: между ними вставляется пробел, чтобы слова из соседних блоков не склеивались
+BLOCK_TAGS = {
+    "address", "article", "blockquote", "br", "dd", "div", "dl", "dt", "figcaption",
+    "figure", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "li", "main", "ol", "p",
+    "pre", "section", "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul",
+}
+
+# Размер фрагмента HTML, подаваемого парсеру за один раз
+CHUNK_SIZE = 64 * 1024
+
+
+class TextExtractor(HTMLParser):
+    """
+    Потоковое извлечение текста из HTML за один проход.
+    Текст внутри SKIP_TAGS (скрипты, стили, JSON-блоки, навигация) и боковых блоков
+    оформления (is_chrome_aside) отбрасывается, дерево документа не строится.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        # Глубина вложенности для каждого пропускаемого элемента
+        self.skip_depth = dict.fromkeys(SKIP_TAGS, 0)
+        # Открытые <aside>: для каждого - пропускается ли его содержимое
+        self.asides = []
+        self.skipping = 0
+        self.pieces = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skip_depth[tag] += 1
+            self.skipping += 1
+        elif tag == "aside":
+            chrome = is_chrome_aside(attrs)
+            self.asides.append(chrome)
+            self.skipping += chrome
+            self.pieces.append(" ")
+        elif tag in BLOCK_TAGS:
+            self.pieces.append(" ")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.pieces.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            if self.skip_depth[tag]:
+                self.skip_depth[tag] -= 1
+                self.skipping -= 1
+        elif tag == "aside":
+            if self.asides:
+                self.skipping -= self.asides.pop()
+            self.pieces.append(" ")
+        elif tag in BLOCK_TAGS:
+            self.pieces.append(" ")
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.pieces.append(data)
+
+    def pop_text(self):
+        text = "".join(self.pieces)
+        self.pieces.clear()
+        return text
+
+
+def is_chrome_aside(attrs):
+    """
+    Является ли <aside> с атрибутами attrs оформлением сайта (боковая колонка, списки статей).
+    """
+    attrs = dict(attrs)
+    classes = set((attrs.get("class") or "").split())
+    return bool(classes & CHROME_ASIDE_CLASSES) or attrs.get("role") in CHROME_ASIDE_ROLES
+
+
+def iter_text(chunks):
+    """
+    Извлекает текст из HTML, поступающего фрагментами.
+    :param chunks: Итерируемый объект со строками HTML.
+    :return: Генератор фрагментов текста.
+    """
+    extractor = TextExtractor()
+    for chunk in chunks:
+        extractor.feed(chunk)
+        yield extractor.pop_text()
+    extractor.close()
+    yield extractor.pop_text()
+
+
+def extract_text(html_content, chunk_size=CHUNK_SIZE):
+    """
+    Возвращает текст страницы без разметки и служебных элементов.
+    """
+    chunks = (html_content[i:i + chunk_size] for i in range(0, len(html_content), chunk_size))
+    return "".join(iter_text(chunks))
+
+
+def extract_text_from_file(path, chunk_size=CHUNK_SIZE):
+    """
+    Извлекает текст из HTML-файла, читая его фрагментами.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        return "".join(iter_text(iter(lambda: file.read(chunk_size), "")))
@@ -1,17 +1,31 @@
+import argparse
+import json
 import os
 import re
+import sys
 from collections import defaultdict
+from multiprocessing import Pool
 from pymorphy2 import MorphAnalyzer
-from natsort import natsorted
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_1.manifest import content_hash
+from task_1.page_store import iter_documents
+from task_2.html_text import extract_text
+from task_2.morph_cache import MorphCache
+from task_2.term_counts import write_term_counts, write_positions
 
 
 # Инициализация лемматизатора
 morph = MorphAnalyzer()
 
+# Общий кэш разбора словоформ для фильтрации, группировки по леммам и обработки запросов
+morph_cache = MorphCache(morph)
+
 
-# Функция для очистки текста от HTML-разметки
+# Функция для очистки текста от HTML-разметки (без скриптов, стилей и навигации)
 def clean_html(html_content):
-    clean_text = re.sub(r'<[^>]+>', '', html_content)
+    clean_text = extract_text(html_content)
     return clean_text
 
 
@@ -25,10 +39,10 @@ def tokenize(text):
 def filter_tokens(tokens):
     filtered_tokens = []
     for token in tokens:
-        parsed = morph.parse(token)[0]
+        pos, _ = morph_cache.parse(token)
         # Исключаем предлоги, союзы, частицы, междометия, числительные и стоп-слова
         if (
-            parsed.tag.POS not in {'PREP', 'CONJ', 'PRCL', 'INTJ', 'NUMR'}
+            pos not in {'PREP', 'CONJ', 'PRCL', 'INTJ', 'NUMR'}
         ):
             filtered_tokens.append(token.lower())  # Приводим к нижнему регистру
     return filtered_tokens # Убираем дубликаты
@@ -42,61 +56,191 @@ def delete_duplicates(tokens):
 def group_by_lemmas(tokens):
     lemmas_dict = defaultdict(list)
     for token in tokens:
-        lemma = morph.parse(token)[0].normal_form
+        _, lemma = morph_cache.parse(token)
         lemmas_dict[lemma].append(token)
     return lemmas_dict
 
 
+# Обработка одного документа: токены, леммы, частоты и позиции токенов записываются в отдельные файлы
+def process_document(
+    doc_id,
+    html_content,
+    tokens_dir="tokens",
+    lemmas_dir="lemmas",
+    counts_dir="counts",
+    positions_dir="positions",
+):
+    # Очистка HTML-разметки
+    clean_text = clean_html(html_content)
+
+    # Токенизация
+    tokens = tokenize(clean_text)
+
+    # Фильтрация токенов (включая удаление стоп-слов и дубликатов).
+    # Сортируем, чтобы порядок словоформ в строках лемм не зависел от порядка множества
+    filtered_tokens = filter_tokens(tokens)
+    write_term_counts(os.path.join(counts_dir, f"counts_{doc_id}.txt"), filtered_tokens)
+    write_positions(os.path.join(positions_dir, f"positions_{doc_id}.txt"), filtered_tokens)
+    filtered_tokens = sorted(delete_duplicates(filtered_tokens))
+
+    # Группировка токенов по леммам
+    lemmas_dict = group_by_lemmas(filtered_tokens)
+
+    # Создаем имя файла для токенов и лемм
+    output_tokens_file = os.path.join(tokens_dir, f"tokens_{doc_id}.txt")
+    output_lemmas_file = os.path.join(lemmas_dir, f"lemmas_{doc_id}.txt")
+
+    # Запись списка токенов в файл
+    with open(output_tokens_file, "w", encoding="utf-8") as file:
+        for token in filtered_tokens:
+            file.write(f"{token}\n")
+
+    # Запись списка лемматизированных токенов в файл
+    with open(output_lemmas_file, "w", encoding="utf-8") as file:
+        for lemma, tokens in sorted(lemmas_dict.items()):
+            file.write(f"{lemma} {' '.join(tokens)}\n")
+
+
+# Инициализация процесса-обработчика: собственный лемматизатор и кэш разбора
+def init_worker(morph_cache_path=None):
+    global morph, morph_cache
+    morph = MorphAnalyzer()
+    morph_cache = MorphCache(morph)
+    if morph_cache_path:
+        morph_cache.load(morph_cache_path)
+
+
+def process_document_task(document):
+    doc_id, html_content = document
+    process_document(doc_id, html_content)
+    # Возвращаем счетчики кэша процесса для общей статистики
+    return doc_id, os.getpid(), morph_cache.hits, morph_cache.misses
+
+
+# Хэши содержимого обработанных документов: по ним --changed-only находит изменившиеся документы
+def load_processed_hashes(path):
+    """
+    :return: Словарь номер документа -> sha256 HTML или None, если прошлого запуска не было.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        return {int(doc_id): sha256 for doc_id, sha256 in json.load(file).items()}
+
+
+def save_processed_hashes(path, hashes):
+    # Записываем во временный файл и подменяем: прерванный запуск не оставит неполных хэшей
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump({str(doc_id): hashes[doc_id] for doc_id in sorted(hashes)}, file, indent=4)
+    os.replace(tmp_path, path)
+
+
+# Удаление результатов документа, которого больше нет среди выкачанных страниц
+def remove_document_outputs(doc_id, tokens_dir="tokens", lemmas_dir="lemmas", counts_dir="counts",
+                            positions_dir="positions"):
+    for path in (
+        os.path.join(tokens_dir, f"tokens_{doc_id}.txt"),
+        os.path.join(lemmas_dir, f"lemmas_{doc_id}.txt"),
+        os.path.join(counts_dir, f"counts_{doc_id}.txt"),
+        os.path.join(positions_dir, f"positions_{doc_id}.txt"),
+    ):
+        if os.path.exists(path):
+            os.remove(path)
+
+
 # Основной код
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--changed-only",
+        action="store_true",
+        help="обработать только новые и изменившиеся с прошлого запуска документы (по хэшам в processed.json)",
+    )
+    parser.add_argument(
+        "--morph-cache",
+        help="файл кэша разбора словоформ между запусками (сохраняется только при --workers 1)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="количество процессов для обработки документов",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=4,
+        help="количество документов, передаваемых процессу за один раз",
+    )
+    args = parser.parse_args()
+
+    # Загружаем кэш разбора словоформ с прошлого запуска
+    if args.morph_cache:
+        morph_cache.load(args.morph_cache)
+
     # Получаем путь к родительской папке
     parent_dir = os.path.dirname(os.getcwd())
 
-    # Путь к папке с выкачанными страницами
+    # Путь к папке с выкачанными страницами и к хранилищу страниц
     input_dir = os.path.join(parent_dir, 'task_1/pages')
+    page_store_prefix = os.path.join(parent_dir, 'task_1/pages')
+    processed_file = "processed.json"
     tokens_dir = "tokens"
     lemmas_dir = "lemmas"
+    counts_dir = "counts"
+    positions_dir = "positions"
 
     # Создаем папки для результатов
     os.makedirs(tokens_dir, exist_ok=True)
     os.makedirs(lemmas_dir, exist_ok=True)
-
-    # Проходим по всем файлам в папке
-    for filename in natsorted(os.listdir(input_dir)):
-        file_path = os.path.join(input_dir, filename)
-
-        # Читаем содержимое файла
-        with open(file_path, "r", encoding="utf-8") as file:
-            html_content = file.read()
-
-        # Очистка HTML-разметки
-        clean_text = clean_html(html_content)
-
-        # Токенизация
-        tokens = tokenize(clean_text)
-
-        # Фильтрация токенов (включая удаление стоп-слов и дубликатов)
-        filtered_tokens = filter_tokens(tokens)
-        filtered_tokens = delete_duplicates(filtered_tokens)
-
-        # Группировка токенов по леммам
-        lemmas_dict = group_by_lemmas(filtered_tokens)
-
-        # Создаем имя файла для токенов и лемм
-        base_name = os.path.splitext(filename)[0]  # Убираем расширение .html
-        output_tokens_file = os.path.join(tokens_dir, f"tokens_{base_name}.txt")
-        output_lemmas_file = os.path.join(lemmas_dir, f"lemmas_{base_name}.txt")
-
-        # Запись списка токенов в файл
-        with open(output_tokens_file, "w", encoding="utf-8") as file:
-            for token in sorted(filtered_tokens):
-                file.write(f"{token}\n")
-
-        # Запись списка лемматизированных токенов в файл
-        with open(output_lemmas_file, "w", encoding="utf-8") as file:
-            for lemma, tokens in sorted(lemmas_dict.items()):
-                file.write(f"{lemma} {' '.join(tokens)}\n")
-
-        print(f"Процесс для файла: {filename} -> tokens_{base_name}.txt, lemmas_{base_name}.txt")
-
-    print("Завершено")
\ No newline at end of file
+    os.makedirs(counts_dir, exist_ok=True)
+    os.makedirs(positions_dir, exist_ok=True)
+
+    # Хэши содержимого документов, обработанных прошлым запуском. Изменения определяются по самим
+    # страницам, а не по списку изменений последнего обхода: так учитываются все обходы с прошлого
+    # запуска и страницы, измененные или удаленные вне краулера. Без хэшей обрабатываются все документы
+    processed_hashes = load_processed_hashes(processed_file)
+    previous_hashes = processed_hashes if args.changed_only else None
+    current_hashes = {}
+
+    # Документы из хранилища страниц или из папки pages, с --changed-only - только новые и измененные
+    def select_documents():
+        for doc_id, html_content in iter_documents(input_dir, page_store_prefix):
+            sha256 = content_hash(html_content)
+            current_hashes[doc_id] = sha256
+            if previous_hashes is None or previous_hashes.get(doc_id) != sha256:
+                yield doc_id, html_content
+
+    documents = select_documents()
+
+    # Счетчики кэша разбора по процессам
+    cache_stats = {}
+
+    if args.workers > 1:
+        with Pool(args.workers, initializer=init_worker, initargs=(args.morph_cache,)) as pool:
+            results = pool.imap_unordered(process_document_task, documents, chunksize=args.chunk_size)
+            for doc_id, pid, hits, misses in results:
+                cache_stats[pid] = (hits, misses)
+                print(f"Процесс для файла: {doc_id}.html -> tokens_{doc_id}.txt, lemmas_{doc_id}.txt")
+    else:
+        for document in documents:
+            doc_id, pid, hits, misses = process_document_task(document)
+            cache_stats[pid] = (hits, misses)
+            print(f"Процесс для файла: {doc_id}.html -> tokens_{doc_id}.txt, lemmas_{doc_id}.txt")
+
+        if args.morph_cache:
+            morph_cache.save(args.morph_cache)
+
+    # Результаты удаленных документов удаляются, хэши запоминаются для следующего запуска
+    for doc_id in sorted(set(processed_hashes or ()) - current_hashes.keys()):
+        remove_document_outputs(doc_id, tokens_dir, lemmas_dir, counts_dir, positions_dir)
+        print(f"Удален документ {doc_id}")
+    save_processed_hashes(processed_file, current_hashes)
+
+    hits = sum(stats[0] for stats in cache_stats.values())
+    misses = sum(stats[1] for stats in cache_stats.values())
+    hit_rate = hits / (hits + misses) if hits + misses else 0
+    print(f"Кэш разбора: попаданий {hits}, промахов {misses}, доля попаданий {hit_rate:.2%}")
+
+    print("Завершено")
@@ -0,0 +1,68 @@
+import json
+import os
+from collections import OrderedDict
+
+
+# Максимальное количество словоформ в кэше
+MAX_CACHE_SIZE = 200000
+
+
+class MorphCache:
+    """
+    Ограниченный LRU-кэш разбора словоформ: словоформа -> (часть речи, нормальная форма).
+    pymorphy2 разбирает слово без учета регистра, поэтому ключом служит словоформа
+    в нижнем регистре.
+    """
+
+    def __init__(self, morph, max_size=MAX_CACHE_SIZE):
+        self.morph = morph
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, token):
+        """
+        Возвращает часть речи и нормальную форму наиболее вероятного разбора.
+        :param token: Словоформа.
+        :return: Кортеж (POS, normal_form).
+        """
+        key = token.lower()
+        result = self.cache.get(key)
+        if result is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return result
+
+        self.misses += 1
+        parsed = self.morph.parse(key)[0]
+        result = (parsed.tag.POS, parsed.normal_form)
+        self.cache[key] = result
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        return result
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.cache),
+            "hit_rate": self.hits / total if total else 0,
+        }
+
+    def load(self, path):
+        """
+        Загружает сохраненный кэш, если файл существует.
+        """
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as file:
+            for token, (pos, normal_form) in json.load(file).items():
+                self.cache[token] = (pos, normal_form)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.cache, file, ensure_ascii=False)
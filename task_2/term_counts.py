@@ -0,0 +1,47 @@
+from collections import Counter, defaultdict
+
+
+# Запись частот токенов документа: первая строка - длина документа (число токенов
+# после фильтрации), далее строки <токен><пробел><число вхождений>
+def write_term_counts(path, tokens):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(f"{len(tokens)}\n")
+        for token, count in sorted(Counter(tokens).items()):
+            file.write(f"{token} {count}\n")
+
+
+# Чтение частот токенов документа: возвращает длину документа и Counter токенов
+def load_term_counts(path):
+    with open(path, "r", encoding="utf-8") as file:
+        length = int(file.readline())
+        counter = Counter()
+        for line in file:
+            token, count = line.split()
+            counter[token] = int(count)
+    return length, counter
+
+
+# Запись позиций токенов документа: строки <токен><пробел><разности позиций через пробел>.
+# Позиции считаются в последовательности токенов после фильтрации и хранятся как разности
+# с предыдущей позицией (первая - от нуля)
+def write_positions(path, tokens):
+    positions = defaultdict(list)
+    for position, token in enumerate(tokens):
+        positions[token].append(position)
+
+    with open(path, "w", encoding="utf-8") as file:
+        for token, token_positions in sorted(positions.items()):
+            deltas = [token_positions[0]] + [
+                current - previous for previous, current in zip(token_positions, token_positions[1:])
+            ]
+            file.write(f"{token} {' '.join(map(str, deltas))}\n")
+
+
+# Чтение позиций токенов документа: возвращает словарь токен -> список разностей позиций
+def load_positions(path):
+    positions = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            token, *deltas = line.split()
+            positions[token] = list(map(int, deltas))
+    return positions
@@ -0,0 +1,250 @@
+"""
+Воспроизводимый замер скорости булева поиска.
+
+Запросы генерируются generate_random_queries с фиксированным зерном для нескольких
+нагрузок (число терминов и глубина вложенности), индекс - синтетический корпус
+с распределением Ципфа заданного размера или реальный индекс из inverted_index.json.
+Для каждого движка и формата индекса выводятся задержки p50/p95/p99, пропускная
+способность и пиковое потребление памяти; результаты сохраняются в JSON.
+
+Пример: python benchmark.py --docs 10000 100000 --queries 200 --seed 42 --output benchmark.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from collections.abc import Mapping
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_3.main import boolean_search, parse_query
+from task_3.binary_index import BinaryIndexReader, load_inverted_index, write_binary_index
+from task_3.bitmap_engine import clear_bitmap_indexes
+from task_3.generate_random_queries import generate_random_queries
+
+
+# Нагрузки: (название, минимум терминов, максимум терминов, глубина вложенности)
+WORKLOADS = [
+    ("small", 3, 5, 2),
+    ("medium", 10, 20, 3),
+    ("large", 20, 40, 5),
+]
+ENGINES = ["set", "bitmap", "planner"]
+FORMATS = ["dict", "binary"]
+
+
+class SyntheticIndex(Mapping):
+    """
+    Инвертированный индекс синтетического корпуса в памяти: отсортированные списки документов
+    всех терминов лежат подряд в одном массиве 32-битных чисел (4 байта на документ вместо
+    десятков байт в множестве Python). Как и BinaryIndexReader, ведет себя как словарь
+    термин -> множество документов: множество строится при обращении к термину, а планировщик
+    берет готовый отсортированный список через postings и document_frequency.
+    """
+
+    def __init__(self):
+        self.terms = {}
+        self.offsets = [0]
+        self.doc_ids = array("i")
+
+    def add(self, term, doc_ids):
+        """
+        Добавляет термин со списком документов (номера сортируются).
+        """
+        self.terms[term] = len(self.offsets) - 1
+        self.doc_ids.extend(sorted(doc_ids))
+        self.offsets.append(len(self.doc_ids))
+
+    def postings(self, term):
+        position = self.terms.get(term)
+        if position is None:
+            return []
+        return self.doc_ids[self.offsets[position]:self.offsets[position + 1]].tolist()
+
+    def document_frequency(self, term):
+        position = self.terms.get(term)
+        return self.offsets[position + 1] - self.offsets[position] if position is not None else 0
+
+    def __getitem__(self, term):
+        if term not in self.terms:
+            raise KeyError(term)
+        return set(self.postings(term))
+
+    def __contains__(self, term):
+        return term in self.terms
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __len__(self):
+        return len(self.terms)
+
+
+def generate_corpus(num_docs, vocabulary_size=50000, doc_length=30, zipf_exponent=1.0, seed=0):
+    """
+    Генерирует инвертированный индекс синтетического корпуса.
+    Частоты терминов подчиняются закону Ципфа: вероятность термина ранга r пропорциональна 1 / r^s.
+    Списки документов строятся сразу по числу документов термина, без генерации текстов,
+    и по одному термину дописываются в SyntheticIndex: корпус из 10^6 документов (около 27 млн записей)
+    занимает около 110 МБ вместо нескольких гигабайт множеств.
+    :param num_docs: Количество документов (номера 0..num_docs-1).
+    :param vocabulary_size: Размер словаря.
+    :param doc_length: Количество словоупотреблений в документе.
+    :param zipf_exponent: Показатель s распределения Ципфа.
+    :param seed: Зерно генератора случайных чисел.
+    :return: SyntheticIndex (термин -> множество документов).
+    """
+    rng = random.Random(seed)
+    weights = [1 / rank ** zipf_exponent for rank in range(1, vocabulary_size + 1)]
+    total_weight = sum(weights)
+
+    inverted_index = SyntheticIndex()
+    for rank, weight in enumerate(weights, start=1):
+        # Вероятность, что термин встретится в документе хотя бы один раз
+        probability = 1 - (1 - weight / total_weight) ** doc_length
+        df = min(num_docs, int(round(probability * num_docs)))
+        if df == 0:
+            # Для редких терминов df округляется случайно, чтобы сохранить ожидаемое число вхождений
+            df = 1 if rng.random() < probability * num_docs else 0
+        if df:
+            inverted_index.add(f"t{rank}", rng.sample(range(num_docs), df))
+    return inverted_index
+
+
+def percentile(sorted_values, fraction):
+    """
+    Перцентиль по методу ближайшего ранга.
+    """
+    position = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[position]
+
+
+def run_engine(queries, inverted_index, total_docs, engine):
+    """
+    Выполняет запросы одним движком.
+    :return: Словарь с задержками (мс), пропускной способностью и пиковой памятью (КБ).
+    """
+    # Кэш битовых карт очищается, чтобы каждый замер начинался с холодного состояния
+    clear_bitmap_indexes()
+    latencies = []
+    start = time.perf_counter()
+    for query in queries:
+        query_start = time.perf_counter()
+        boolean_search(query, inverted_index, total_docs, engine=engine)
+        latencies.append((time.perf_counter() - query_start) * 1000)
+    elapsed = time.perf_counter() - start
+
+    # Память замеряется отдельным проходом: tracemalloc замедляет выполнение
+    clear_bitmap_indexes()
+    tracemalloc.start()
+    for query in queries:
+        boolean_search(query, inverted_index, total_docs, engine=engine)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    clear_bitmap_indexes()
+
+    latencies.sort()
+    return {
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "throughput_qps": len(queries) / elapsed if elapsed else 0,
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def run_benchmark(corpora, num_queries, seed, engines=ENGINES, formats=FORMATS, workloads=WORKLOADS):
+    """
+    Замер всех сочетаний корпуса, формата индекса, нагрузки и движка.
+    :param corpora: Список кортежей (название корпуса, инвертированный индекс, количество документов).
+    :return: Список результатов.
+    """
+    results = []
+    for corpus_name, inverted_index, total_docs in corpora:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            indexes = {}
+            for index_format in formats:
+                if index_format == "binary":
+                    path = os.path.join(temp_dir, "inverted_index.bin")
+                    write_binary_index(inverted_index, path)
+                    indexes[index_format] = BinaryIndexReader(path)
+                else:
+                    indexes[index_format] = inverted_index
+
+            for workload_name, min_terms, max_terms, max_depth in workloads:
+                queries = [
+                    query.lower() for query in generate_random_queries(
+                        inverted_index, num_queries, min_terms, max_terms, max_depth, seed=seed
+                    )
+                ]
+                # Запросы разбираются заранее, чтобы ошибки разбора не попадали в замер
+                for query in queries:
+                    parse_query(query)
+
+                for index_format, index in indexes.items():
+                    for engine in engines:
+                        result = {
+                            "corpus": corpus_name,
+                            "docs": total_docs,
+                            "terms": len(inverted_index),
+                            "workload": workload_name,
+                            "queries": len(queries),
+                            "format": index_format,
+                            "engine": engine,
+                        }
+                        result.update(run_engine(queries, index, total_docs, engine))
+                        results.append(result)
+                        print(
+                            f"{corpus_name:<12} {workload_name:<7} {index_format:<7} {engine:<8} "
+                            f"p50={result['p50_ms']:8.3f} p95={result['p95_ms']:8.3f} "
+                            f"p99={result['p99_ms']:8.3f} мс  {result['throughput_qps']:9.1f} запр/с  "
+                            f"{result['peak_memory_kb']:10.1f} КБ"
+                        )
+
+            for index in indexes.values():
+                if isinstance(index, BinaryIndexReader):
+                    index.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замер скорости булева поиска")
+    parser.add_argument("--docs", type=int, nargs="*", default=[10000, 100000],
+                        help="размеры синтетических корпусов (количество документов)")
+    parser.add_argument("--real", action="store_true", help="замерить также реальный индекс inverted_index.json")
+    parser.add_argument("--vocabulary", type=int, default=50000, help="размер словаря синтетического корпуса")
+    parser.add_argument("--doc-length", type=int, default=30, help="словоупотреблений в синтетическом документе")
+    parser.add_argument("--queries", type=int, default=200, help="запросов в каждой нагрузке")
+    parser.add_argument("--seed", type=int, default=42, help="зерно генерации корпуса и запросов")
+    parser.add_argument("--engines", nargs="*", default=ENGINES, choices=ENGINES)
+    parser.add_argument("--formats", nargs="*", default=FORMATS, choices=FORMATS)
+    parser.add_argument("--output", default="benchmark.json", help="файл для результатов в формате JSON")
+    args = parser.parse_args()
+
+    corpora = []
+    if args.real:
+        real_index = load_inverted_index("inverted_index.json", "inverted_index.bin")
+        total_docs = len(os.listdir(os.path.join(os.path.dirname(os.getcwd()), "task_2/tokens")))
+        corpora.append(("real", {term: real_index[term] for term in real_index}, total_docs))
+    for num_docs in args.docs:
+        corpus = generate_corpus(num_docs, args.vocabulary, args.doc_length, seed=args.seed)
+        corpora.append((f"zipf-{num_docs}", corpus, num_docs))
+
+    results = run_benchmark(corpora, args.queries, args.seed, args.engines, args.formats)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump({
+            "python": platform.python_version(),
+            "seed": args.seed,
+            "vocabulary": args.vocabulary,
+            "doc_length": args.doc_length,
+            "results": results,
+        }, file, ensure_ascii=False, indent=4)
+    print(f"Результаты сохранены в {args.output}")
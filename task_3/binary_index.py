@@ -0,0 +1,190 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from collections.abc import Mapping
+
+
+# Заголовок: сигнатура, число терминов, смещения лексикона, списков документов и словаря терминов,
+# версия индекса (sha256 содержимого)
+INDEX_MAGIC = b"OIPIDX01"
+HEADER = struct.Struct("<8sIQQQ32s")
+# Запись лексикона: смещение термина, смещение списка документов, число документов.
+# Длины термина и списка определяются по смещениям следующей записи, поэтому
+# в конце лексикона хранится дополнительная запись с длинами всех терминов и списков
+LEXICON_ENTRY = struct.Struct("<III")
+
+
+def encode_varint(value, output):
+    while value >= 0x80:
+        output.append((value & 0x7F) | 0x80)
+        value >>= 7
+    output.append(value)
+
+
+def encode_postings(doc_ids):
+    """
+    Кодирует отсортированный список документов разностями в формате varint.
+    """
+    output = bytearray()
+    previous = 0
+    for doc_id in doc_ids:
+        encode_varint(doc_id - previous, output)
+        previous = doc_id
+    return bytes(output)
+
+
+def decode_postings(data):
+    """
+    Декодирует список документов, закодированный encode_postings.
+    """
+    doc_ids = []
+    doc_id = 0
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        doc_id += value
+        doc_ids.append(doc_id)
+        value = 0
+        shift = 0
+    return doc_ids
+
+
+def write_binary_index(inverted_index, path):
+    """
+    Записывает инвертированный индекс в двоичный файл.
+    Термины отсортированы по байтам UTF-8, что позволяет искать их двоичным поиском
+    прямо в отображенном в память файле.
+    :param inverted_index: Словарь термин -> множество документов.
+    :param path: Путь к файлу индекса.
+    """
+    terms = sorted(inverted_index, key=lambda term: term.encode("utf-8"))
+
+    terms_blob = bytearray()
+    lexicon = bytearray()
+    postings_blob = bytearray()
+    for term in terms:
+        encoded_term = term.encode("utf-8")
+        doc_ids = sorted(inverted_index[term])
+        postings = encode_postings(doc_ids)
+        lexicon += LEXICON_ENTRY.pack(len(terms_blob), len(postings_blob), len(doc_ids))
+        terms_blob += encoded_term
+        postings_blob += postings
+    lexicon += LEXICON_ENTRY.pack(len(terms_blob), len(postings_blob), 0)
+
+    terms_offset = HEADER.size
+    lexicon_offset = terms_offset + len(terms_blob)
+    postings_offset = lexicon_offset + len(lexicon)
+    body = bytes(terms_blob + lexicon + postings_blob)
+    version = hashlib.sha256(body).digest()
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(INDEX_MAGIC, len(terms), lexicon_offset, postings_offset, terms_offset, version))
+        file.write(body)
+
+
+class BinaryIndexReader(Mapping):
+    """
+    Чтение двоичного инвертированного индекса, отображенного в память.
+    Ведет себя как словарь термин -> множество документов; список документов
+    декодируется только при обращении к термину.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.term_count, self.lexicon_offset, self.postings_offset,
+         self.terms_offset, version) = HEADER.unpack_from(self.data, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Неизвестный формат индекса: {path}")
+        self.version = version.hex()
+
+    def close(self):
+        self.data.close()
+
+    def _entry(self, position):
+        """
+        Запись лексикона: (смещение термина, длина термина, смещение списка, длина списка, число документов).
+        """
+        offset = self.lexicon_offset + position * LEXICON_ENTRY.size
+        term_offset, postings_offset, df = LEXICON_ENTRY.unpack_from(self.data, offset)
+        next_term_offset, next_postings_offset, _ = LEXICON_ENTRY.unpack_from(self.data, offset + LEXICON_ENTRY.size)
+        return term_offset, next_term_offset - term_offset, postings_offset, next_postings_offset - postings_offset, df
+
+    def _term_bytes(self, entry):
+        start = self.terms_offset + entry[0]
+        return self.data[start:start + entry[1]]
+
+    def term_at(self, position):
+        return self._term_bytes(self._entry(position)).decode("utf-8")
+
+    def lower_bound(self, encoded_term):
+        """
+        Позиция первого термина, не меньшего encoded_term (в байтах UTF-8).
+        """
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._term_bytes(self._entry(middle)) < encoded_term:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _find(self, term):
+        encoded_term = term.encode("utf-8")
+        position = self.lower_bound(encoded_term)
+        if position < self.term_count:
+            entry = self._entry(position)
+            if self._term_bytes(entry) == encoded_term:
+                return entry
+        return None
+
+    def postings(self, term):
+        """
+        Отсортированный список документов термина (пустой, если термина нет).
+        """
+        entry = self._find(term)
+        if entry is None:
+            return []
+        start = self.postings_offset + entry[2]
+        return decode_postings(self.data[start:start + entry[3]])
+
+    def document_frequency(self, term):
+        entry = self._find(term)
+        return entry[4] if entry is not None else 0
+
+    def __getitem__(self, term):
+        entry = self._find(term)
+        if entry is None:
+            raise KeyError(term)
+        start = self.postings_offset + entry[2]
+        return set(decode_postings(self.data[start:start + entry[3]]))
+
+    def __contains__(self, term):
+        return self._find(term) is not None
+
+    def __iter__(self):
+        for position in range(self.term_count):
+            yield self.term_at(position)
+
+    def __len__(self):
+        return self.term_count
+
+
+def load_inverted_index(json_path, binary_path):
+    """
+    Загружает инвертированный индекс: двоичный, если он построен, иначе из JSON.
+    :return: Отображение термин -> множество документов.
+    """
+    if os.path.exists(binary_path):
+        return BinaryIndexReader(binary_path)
+
+    with open(json_path, "r", encoding="utf-8") as file:
+        inverted_index = json.load(file)
+    return {term: set(doc_ids) for term, doc_ids in inverted_index.items()}
@@ -0,0 +1,115 @@
+from collections import OrderedDict
+
+
+# Сколько битовых индексов хранить одновременно (по одному на инвертированный индекс)
+MAX_CACHED_INDEXES = 4
+
+
+def to_bitmap(doc_ids):
+    """
+    Преобразует множество номеров документов в битовую карту (целое число, бит i - документ i).
+    """
+    if not doc_ids:
+        return 0
+    bits = bytearray(max(doc_ids) // 8 + 1)
+    for doc_id in doc_ids:
+        bits[doc_id >> 3] |= 1 << (doc_id & 7)
+    return int.from_bytes(bits, "little")
+
+
+def from_bitmap(bitmap):
+    """
+    Преобразует битовую карту обратно в множество номеров документов.
+    """
+    doc_ids = set()
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for position, byte in enumerate(data):
+        if not byte:
+            continue
+        base = position * 8
+        for bit in range(8):
+            if byte >> bit & 1:
+                doc_ids.add(base + bit)
+    return doc_ids
+
+
+class BitmapIndex:
+    """
+    Битовые карты терминов поверх инвертированного индекса.
+    Карта термина строится при первом обращении и переиспользуется, AND/OR/NOT
+    выполняются побитовыми операциями над целыми числами Python сразу по машинным словам.
+    """
+
+    def __init__(self, inverted_index, total_docs):
+        self.inverted_index = inverted_index
+        # Множество всех документов, как и в set-движке: range(total_docs)
+        self.live_docs = (1 << total_docs) - 1
+        self.bitmaps = {}
+
+    def term(self, term):
+        bitmap = self.bitmaps.get(term)
+        if bitmap is None:
+            bitmap = to_bitmap(self.inverted_index.get(term, set()))
+            self.bitmaps[term] = bitmap
+        return bitmap
+
+    def evaluate(self, expression, evaluate_leaf, live_docs=None):
+        """
+        Вычисляет дерево запроса над битовыми картами.
+        :param expression: Дерево выражения, построенное parse_query.
+        :param evaluate_leaf: Функция, возвращающая множество документов для фраз и NEAR.
+        :param live_docs: Битовая карта множества всех документов для NOT (по умолчанию range(total_docs)).
+        :return: Битовая карта результата.
+        """
+        if isinstance(expression, str):
+            return self.term(expression.lower())
+
+        operator, *operands = expression
+        if operator == 'and':
+            result = self.evaluate(operands[0], evaluate_leaf, live_docs)
+            for operand in operands[1:]:
+                if not result:
+                    break
+                result &= self.evaluate(operand, evaluate_leaf, live_docs)
+            return result
+        elif operator == 'or':
+            result = 0
+            for operand in operands:
+                result |= self.evaluate(operand, evaluate_leaf, live_docs)
+            return result
+        elif operator == 'not':
+            universe = self.live_docs if live_docs is None else live_docs
+            return universe & ~self.evaluate(operands[0], evaluate_leaf, live_docs)
+        elif operator == 'wildcard':
+            result = 0
+            for term in operands[1]:
+                result |= self.term(term)
+            return result
+        return to_bitmap(evaluate_leaf(expression))
+
+
+# Битовые индексы по идентификатору и версии инвертированного индекса. Ссылка на сам индекс
+# хранится вместе с битовым, чтобы идентификатор не мог достаться другому объекту
+_bitmap_indexes = OrderedDict()
+
+
+def get_bitmap_index(inverted_index, total_docs):
+    """
+    Возвращает битовый индекс для инвертированного индекса, создавая его при первом обращении.
+    """
+    # Версия есть у индексов, которые могут меняться (сегментный индекс) или перечитываться с диска
+    key = (id(inverted_index), getattr(inverted_index, "version", None), total_docs)
+    cached = _bitmap_indexes.get(key)
+    if cached is not None and cached[0] is inverted_index:
+        _bitmap_indexes.move_to_end(key)
+        return cached[1]
+
+    bitmap_index = BitmapIndex(inverted_index, total_docs)
+    _bitmap_indexes[key] = (inverted_index, bitmap_index)
+    if len(_bitmap_indexes) > MAX_CACHED_INDEXES:
+        _bitmap_indexes.popitem(last=False)
+    return bitmap_index
+
+
+def clear_bitmap_indexes():
+    _bitmap_indexes.clear()
@@ -1,7 +1,13 @@
+import argparse
 import os
 import random
-import json
-from main import boolean_search
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_3.main import boolean_search, parse_query
+from task_3.binary_index import load_inverted_index
+from task_3.query_cache import QueryCache
 
 
 def generate_random_queries(
@@ -9,7 +15,8 @@ def generate_random_queries(
     num_queries=10,
     min_terms=3,
     max_terms=8,
-    max_depth=3
+    max_depth=3,
+    seed=None
 ):
     """
     Генерирует случайные корректные запросы на основе инвертированного списка слов.
@@ -18,10 +25,13 @@ def generate_random_queries(
     :param min_terms: Минимальное количество терминов в запросе.
     :param max_terms: Максимальное количество терминов в запросе.
     :param max_depth: Максимальная глубина вложенности скобок.
+    :param seed: Зерно генератора случайных чисел (одно и то же зерно дает одни и те же запросы).
     :return: Список случайно сгенерированных запросов.
     """
+    rng = random.Random(seed)
+
     # Список всех уникальных терминов из индекса
-    terms = list(inverted_index.keys())
+    terms = sorted(inverted_index.keys())
 
     # Возможные операторы
     operators = ["and", "or"]
@@ -29,50 +39,51 @@ def generate_random_queries(
     queries = []
     for _ in range(num_queries):
         # Случайное количество терминов в запросе (между min_terms и max_terms)
-        num_terms = random.randint(min_terms, max_terms)
+        num_terms = rng.randint(min_terms, max_terms)
 
         # Генерируем выражение с заданным количеством терминов
-        query = generate_expression(terms, operators, num_terms, max_depth)
+        query = generate_expression(terms, operators, num_terms, max_depth, rng)
         queries.append(query)
 
     return queries
 
 
-def generate_expression(terms, operators, num_terms, depth):
+def generate_expression(terms, operators, num_terms, depth, rng=random):
     """
     Рекурсивно генерирует случайное логическое выражение.
     :param terms: Список терминов.
     :param operators: Список операторов.
     :param num_terms: Требуемое количество терминов в выражении.
     :param depth: Текущая глубина вложенности.
+    :param rng: Генератор случайных чисел.
     :return: Строка с логическим выражением.
     """
     if num_terms == 1 or depth == 0:
         # Базовый случай: возвращаем случайный термин
-        return random.choice(terms)
+        return rng.choice(terms)
 
     # Выбираем случайный оператор
-    operator = random.choice(operators)
+    operator = rng.choice(operators)
 
     # Разделяем оставшееся количество терминов между левой и правой частями
-    left_terms = random.randint(1, num_terms - 1)
+    left_terms = rng.randint(1, num_terms - 1)
     right_terms = num_terms - left_terms
 
     # Генерируем левую и правую части выражения
-    left = generate_expression(terms, operators, left_terms, depth - 1)
-    right = generate_expression(terms, operators, right_terms, depth - 1)
+    left = generate_expression(terms, operators, left_terms, depth - 1, rng)
+    right = generate_expression(terms, operators, right_terms, depth - 1, rng)
 
     # Случайно добавляем NOT к одной из частей
-    if random.random() < 0.3:  # 30% вероятность добавления NOT
+    if rng.random() < 0.3:  # 30% вероятность добавления NOT
         left = add_not(left)
-    if random.random() < 0.3:
+    if rng.random() < 0.3:
         right = add_not(right)
 
     # Объединяем части с оператором
     expression = f"{left} {operator} {right}"
 
     # Случайно оборачиваем выражение в скобки
-    if random.random() < 0.5:  # 50% вероятность добавления скобок
+    if rng.random() < 0.5:  # 50% вероятность добавления скобок
         expression = f"({expression})"
 
     return expression
@@ -92,6 +103,10 @@ def add_not(expression):
 
 # Пример использования
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Случайные булевы запросы и результаты поиска по ним")
+    parser.add_argument("--seed", type=int, default=42, help="зерно генерации запросов")
+    args = parser.parse_args()
+
     # Получаем путь к родительской папке
     parent_dir = os.path.dirname(os.getcwd())
 
@@ -100,12 +115,8 @@ if __name__ == "__main__":
 
     total_tokens_docs = len(os.listdir(tokens_dir))
 
-    # Пример инвертированного индекса
-    with open("inverted_index.json", "r", encoding="utf-8") as file:
-        inverted_index = json.load(file)
-
-    for key in inverted_index:
-        inverted_index[key] = set(inverted_index[key])
+    # Пример инвертированного индекса (двоичный, если он построен, иначе JSON)
+    inverted_index = load_inverted_index("inverted_index.json", "inverted_index.bin")
 
     # Генерация случайных запросов
     random_queries = generate_random_queries(
@@ -113,16 +124,20 @@ if __name__ == "__main__":
         num_queries=50,
         min_terms=10,
         max_terms=20,
-        max_depth=3
+        max_depth=3,
+        seed=args.seed,
     )
 
+    # Кэш разобранных запросов и результатов: повторяющиеся и эквивалентные запросы не вычисляются заново
+    query_cache = QueryCache(parse_query)
+
     result_str = ""
 
     # Вывод запросов
     print("Случайно сгенерированные запросы:")
     for query in random_queries:
         print(query)
-        result_tokens = boolean_search(query.lower(), inverted_index, total_tokens_docs)
+        result_tokens = boolean_search(query.lower(), inverted_index, total_tokens_docs, cache=query_cache)
         main_result = (
             f"Результаты поиска по запросу {query}:"
             f"\nДокументы: {', '.join(list(map(str, sorted(result_tokens))))}\n\n"
@@ -131,3 +146,5 @@ if __name__ == "__main__":
 
     with open("random_queries.txt", "w", encoding="utf-8") as file:
         file.write(result_str)
+
+    print(f"Кэш запросов: {query_cache.stats()}")
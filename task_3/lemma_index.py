@@ -0,0 +1,49 @@
+import json
+import math
+import os
+from collections import defaultdict
+
+
+def build_lemma_index(lemmas_dir, total_docs):
+    """
+    Строит индекс лемм по файлам лемм из task_2.
+    Словоформа всегда сводится к одной и той же лемме, поэтому документы леммы -
+    это документы, в файле лемм которых она встречается.
+    :param lemmas_dir: Папка с файлами lemmas_{номер}.txt.
+    :param total_docs: Общее количество документов.
+    :return: Словарь лемма -> {"df": число документов, "idf": log(N / df), "docs": список документов}.
+    """
+    postings = defaultdict(list)
+
+    for filename in os.listdir(lemmas_dir):
+        doc_id = int(filename[len("lemmas_"):-len(".txt")])
+        with open(os.path.join(lemmas_dir, filename), "r", encoding="utf-8") as file:
+            for line in file:
+                parts = line.split()
+                if parts:
+                    postings[parts[0]].append(doc_id)
+
+    lemma_index = {}
+    for lemma in sorted(postings):
+        doc_ids = sorted(postings[lemma])
+        lemma_index[lemma] = {
+            "df": len(doc_ids),
+            "idf": math.log(total_docs / len(doc_ids)),
+            "docs": doc_ids,
+        }
+    return lemma_index
+
+
+def save_lemma_index(lemma_index, path):
+    # Одна лемма на строку, как в inverted_index.json
+    lines = [
+        f'{json.dumps(lemma, ensure_ascii=False)}: {json.dumps(entry)}'
+        for lemma, entry in lemma_index.items()
+    ]
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("{\n" + ",\n".join(f"    {line}" for line in lines) + "\n}")
+
+
+def load_lemma_index(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
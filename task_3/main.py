@@ -1,13 +1,31 @@
+import argparse
 import os
 import re
+import sys
 from collections import defaultdict
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_3.binary_index import write_binary_index
+from task_3.lemma_index import build_lemma_index, save_lemma_index
+from task_3.bitmap_engine import get_bitmap_index, to_bitmap, from_bitmap
+from task_3.planner import plan_query, execute_plan, explain
+from task_3.wildcard import expand_wildcards
+from task_3.positional_index import (
+    build_positional_index,
+    save_positional_index,
+    phrase_documents,
+    near_documents,
+)
+
 
 # Получаем путь к родительской папке
 parent_dir = os.path.dirname(os.getcwd())
 
 # Путь к папке с выкачанными страницами
 tokens_dir = os.path.join(parent_dir, 'task_2/tokens')
+positions_dir = os.path.join(parent_dir, 'task_2/positions')
+lemmas_dir = os.path.join(parent_dir, 'task_2/lemmas')
 
 
 # 1. Загрузка данных
@@ -36,14 +54,130 @@ def load_tokens(tokens_dir):
 
 
 # 2. Булев поиск
-def boolean_search(query, inverted_index, total_docs):
+# Слова фразы без предлогов, союзов, частиц и т.п.
+def filter_phrase_words(words):
+    """
+    Убирает из фразы слова, которых нет в индексе, тем же фильтром, что task_2:
+    позиции в индексе считаются без этих слов, поэтому "гарри и рон" ищется как "гарри рон".
+    Если фильтр убирает все слова, фраза остается как есть (и ничего не находит, как отдельное такое слово).
+    """
+    # Лемматизатор task_2 загружается только при первом запросе с фразой
+    from task_2.main import filter_tokens
+    return tuple(filter_tokens(words)) or words
+
+
+# Парсинг запроса в дерево выражений
+def parse_query(query_string):
+    """
+    Преобразует строку запроса в дерево выражений.
+    Пустой запрос, пустая фраза ("") и оператор без операндов - ошибка ValueError.
+    """
+    tokens = re.findall(r'"[^"]*"|near/\d+|\(|\)|not|and|or|[\w*]+', query_string)
+    output = []
+    operators = []
+
+    precedence = {'near': 4, 'not': 3, 'and': 2, 'or': 1}
+
+    def apply_operator():
+        operator = operators.pop()
+        if len(output) < (1 if operator == 'not' else 2):
+            raise ValueError(f"Не хватает операндов оператора {operator.upper()}")
+        if operator == 'not':
+            operand = output.pop()
+            output.append((operator, operand))
+        elif operator.startswith('near/'):
+            right = output.pop()
+            left = output.pop()
+            if not isinstance(left, str) or not isinstance(right, str):
+                raise ValueError("Оператор NEAR применяется только к отдельным словам")
+            output.append(('near', int(operator[len('near/'):]), left, right))
+        else:
+            right = output.pop()
+            left = output.pop()
+            output.append((operator, left, right))
+
+    def operator_precedence(operator):
+        return precedence['near'] if operator.startswith('near/') else precedence[operator]
+
+    for token in tokens:
+        if token in ('and', 'or', 'not') or token.startswith('near/'):
+            while (operators and operators[-1] != '(' and
+                   operator_precedence(operators[-1]) >= operator_precedence(token)):
+                apply_operator()
+            operators.append(token)
+        elif token == '(':
+            operators.append(token)
+        elif token == ')':
+            while operators and operators[-1] != '(':
+                apply_operator()
+            if not operators:
+                raise ValueError("Лишняя закрывающая скобка в запросе")
+            operators.pop()
+        elif token.startswith('"'):
+            # Фраза в кавычках: одно слово - обычный термин, несколько - поиск фразы
+            words = tuple(re.findall(r'\w+', token))
+            if not words:
+                raise ValueError("Пустая фраза в запросе")
+            if len(words) > 1:
+                words = filter_phrase_words(words)
+            if len(words) == 1:
+                output.append(words[0])
+            else:
+                output.append(('phrase', words))
+        elif '*' in token:
+            # Шаблон: гриф*, *дор, *ерми*
+            output.append(('wildcard', token))
+        else:
+            output.append(token)
+
+    while operators:
+        if operators[-1] == '(':
+            raise ValueError("Не закрыта скобка в запросе")
+        apply_operator()
+
+    if not output:
+        raise ValueError("Пустой запрос")
+    return output[0]
+
+
+def evaluate_positional(expression, positional_index):
+    """
+    Вычисляет фразу или NEAR по позиционному индексу.
+    :return: Множество ID документов.
+    """
+    if positional_index is None:
+        raise ValueError("Для фраз и NEAR нужен позиционный индекс")
+
+    operator, *operands = expression
+    if operator == 'phrase':
+        return phrase_documents(positional_index, operands[0])
+    distance, left, right = operands
+    return near_documents(positional_index, left, right, distance)
+
+
+def boolean_search(query, inverted_index, total_docs, positional_index=None, engine="set", cache=None,
+                   live_docs=None):
     """
     Выполняет булев поиск по инвертированному индексу.
+    Кроме AND, OR, NOT поддерживаются фразы в кавычках ("узник азкабана")
+    и оператор близости NEAR/k (дары near/3 смерти), которые вычисляются
+    по позиционному индексу, и шаблоны терминов (гриф*, *дор), которые раскрываются
+    в объединение подходящих терминов (см. wildcard.py).
     :param query: Строка запроса.
     :param inverted_index: Инвертированный индекс.
     :param total_docs: Общее количество документов.
+    :param positional_index: Позиционный индекс (нужен для фраз и NEAR).
+    :param engine: Способ вычисления: "set" - множества Python,
+        "bitmap" - битовые карты терминов (быстрее на больших индексах и глубоких запросах),
+        "planner" - план с упорядочиванием операндов по числу документов (см. planner.py).
+    :param cache: QueryCache для разобранных запросов, планов и результатов (по умолчанию без кэша).
+    :param live_docs: Множество всех документов, относительно которого вычисляется NOT
+        (для сегментного индекса - живые документы). По умолчанию range(total_docs).
     :return: Множество ID документов, соответствующих запросу.
     """
+    def evaluate_leaf(expression):
+        return evaluate_positional(expression, positional_index)
+
     def evaluate(expression):
         """
         Рекурсивно вычисляет выражение для булева поиска.
@@ -53,58 +187,57 @@ def boolean_search(query, inverted_index, total_docs):
             return inverted_index.get(term, set())
 
         operator, *operands = expression
-        if operator == 'and':
+        if operator in ('phrase', 'near'):
+            return evaluate_leaf(expression)
+        elif operator == 'wildcard':
+            return set().union(*[inverted_index.get(term, set()) for term in operands[1]])
+        elif operator == 'and':
             return set.intersection(*[evaluate(op) for op in operands])
         elif operator == 'or':
             return set.union(*[evaluate(op) for op in operands])
         elif operator == 'not':
             operand = evaluate(operands[0])
-            return set(range(total_docs)) - operand
-
-    # Парсинг запроса в дерево выражений
-    def parse_query(query_string):
-        """
-        Преобразует строку запроса в дерево выражений.
-        """
-        tokens = re.findall(r'\(|\)|not|and|or|\w+', query_string)
-        print(tokens)
-        output = []
-        operators = []
-
-        precedence = {'not': 3, 'and': 2, 'or': 1}
-
-        def apply_operator():
-            operator = operators.pop()
-            if operator == 'not':
-                operand = output.pop()
-                output.append((operator, operand))
-            else:
-                right = output.pop()
-                left = output.pop()
-                output.append((operator, left, right))
-
-        for token in tokens:
-            if token in ('and', 'or', 'not'):
-                while (operators and operators[-1] != '(' and
-                       precedence[operators[-1]] >= precedence[token]):
-                    apply_operator()
-                operators.append(token)
-            elif token == '(':
-                operators.append(token)
-            elif token == ')':
-                while operators[-1] != '(':
-                    apply_operator()
-                operators.pop()
-            else:
-                output.append(token)
-
-        while operators:
-            apply_operator()
-
-        return output[0]
-
-    parsed_query = parse_query(query)
-    return evaluate(parsed_query)
+            universe = set(range(total_docs)) if live_docs is None else set(live_docs)
+            return universe - operand
+
+    if cache is None:
+        parsed_query = parse_query(query)
+    else:
+        parsed_query = cache.parse(query)
+        result = cache.get_result(parsed_query, inverted_index, total_docs, positional_index, live_docs)
+        if result is not None:
+            return set(result)
+
+    # Ключи кэша строятся по запросу с шаблонами, вычисляется запрос с раскрытыми шаблонами
+    expanded_query = expand_wildcards(parsed_query, inverted_index)
+
+    if engine == "bitmap":
+        bitmap_index = get_bitmap_index(inverted_index, total_docs)
+        live_bitmap = to_bitmap(live_docs) if live_docs is not None else None
+        result = from_bitmap(bitmap_index.evaluate(expanded_query, evaluate_leaf, live_bitmap))
+    elif engine == "planner":
+        plan = cache.get_plan(parsed_query, inverted_index, total_docs) if cache is not None else None
+        if plan is None:
+            plan = plan_query(expanded_query, inverted_index, total_docs)
+            if cache is not None:
+                cache.put_plan(parsed_query, inverted_index, total_docs, plan)
+        result = set(execute_plan(plan, inverted_index, total_docs, evaluate_leaf, live_docs))
+    elif engine == "set":
+        result = evaluate(expanded_query)
+    else:
+        raise ValueError(f"Неизвестный движок булева поиска: {engine}")
+
+    if cache is not None:
+        cache.put_result(parsed_query, inverted_index, total_docs, positional_index, live_docs, result)
+    return result
+
+
+def explain_query(query, inverted_index, total_docs):
+    """
+    Возвращает план выполнения запроса с оценками числа документов на каждом шаге.
+    """
+    expression = expand_wildcards(parse_query(query), inverted_index)
+    return explain(plan_query(expression, inverted_index, total_docs))
 
 
 def custom_json_dump(data, fp, indent=4):
@@ -133,6 +266,14 @@ def custom_json_dump(data, fp, indent=4):
 
 # 3. Пример использования
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--query", help="запрос для булева поиска (по умолчанию вводится с клавиатуры)")
+    parser.add_argument("--build-only", action="store_true", help="только построить индекс, без поиска")
+    parser.add_argument("--engine", choices=["set", "bitmap", "planner"], default="set",
+                        help="движок булева поиска")
+    parser.add_argument("--explain", action="store_true", help="вывести план выполнения запроса")
+    args = parser.parse_args()
+
     # Загрузка инвертированного индекса
     inverted_index = load_tokens(tokens_dir)
 
@@ -141,25 +282,40 @@ if __name__ == "__main__":
     with open("inverted_index.json", "w") as fp:
         custom_json_dump(inverted_index, fp)
 
-    # Определяем общее количество документов
-    total_tokens_docs = len(os.listdir(tokens_dir))
-
-    # Ввод запроса
-    query_help = "Введите запрос (например, '(Клеопатра AND Цезарь) OR Помпей'): "
-    query = input(query_help)
-
-    # Выполнение поиска
-    result_tokens = boolean_search(query.lower(), inverted_index, total_tokens_docs)
-
-    main_result = (
-        f"\nРезультаты поиска по запросу {query}:"
-        f"\nДокументы: {', '.join(list(map(str, sorted(result_tokens))))}"
-    )
-    print(main_result)
-
-
-
-
+    # Двоичный индекс со сжатыми списками документов
+    write_binary_index(inverted_index, "inverted_index.bin")
 
+    # Построение и сохранение позиционного индекса (если в task_2 посчитаны позиции токенов)
+    positional_index = None
+    if os.path.exists(positions_dir):
+        positional_index = build_positional_index(positions_dir)
+        save_positional_index(positional_index, "positional_index.json")
 
+    # Определяем общее количество документов
+    total_tokens_docs = len(os.listdir(tokens_dir))
 
+    # Индекс лемм с df и idf, который использует task_4
+    if os.path.exists(lemmas_dir):
+        save_lemma_index(build_lemma_index(lemmas_dir, total_tokens_docs), "lemma_index.json")
+
+    # Поиск по индексу, если требуется не только его построение
+    if not args.build_only:
+        # Ввод запроса
+        query = args.query
+        if query is None:
+            query_help = "Введите запрос (например, '(Клеопатра AND Цезарь) OR Помпей'): "
+            query = input(query_help)
+
+        if args.explain:
+            print(explain_query(query.lower(), inverted_index, total_tokens_docs))
+
+        # Выполнение поиска
+        result_tokens = boolean_search(
+            query.lower(), inverted_index, total_tokens_docs, positional_index, engine=args.engine
+        )
+
+        main_result = (
+            f"\nРезультаты поиска по запросу {query}:"
+            f"\nДокументы: {', '.join(list(map(str, sorted(result_tokens))))}"
+        )
+        print(main_result)
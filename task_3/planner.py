@@ -0,0 +1,239 @@
+from bisect import bisect_left
+
+
+# Во сколько раз один список должен быть длиннее другого, чтобы пересекать их галопом
+GALLOP_RATIO = 8
+
+
+class PlanNode:
+    """
+    Узел плана булева запроса.
+    :param operator: term, positional, and, or, difference, not или empty.
+    :param children: Дочерние узлы. Для difference первый узел - уменьшаемое,
+        остальные - вычитаемые; результат, как и у NOT, ограничивается множеством всех документов.
+    :param term: Термин (для term).
+    :param expression: Выражение фразы или NEAR (для positional).
+    :param estimate: Оценка числа документов в результате.
+    """
+
+    def __init__(self, operator, children=(), term=None, expression=None, estimate=0):
+        self.operator = operator
+        self.children = list(children)
+        self.term = term
+        self.expression = expression
+        self.estimate = estimate
+
+
+def document_frequency(inverted_index, term):
+    if hasattr(inverted_index, "document_frequency"):
+        return inverted_index.document_frequency(term)
+    return len(inverted_index.get(term, ()))
+
+
+def postings_list(inverted_index, term):
+    if hasattr(inverted_index, "postings"):
+        return inverted_index.postings(term)
+    return sorted(inverted_index.get(term, ()))
+
+
+def flatten(expression, operator):
+    """
+    Раскрывает вложенные цепочки одного оператора: (a and (b and c)) -> [a, b, c].
+    """
+    if isinstance(expression, tuple) and expression[0] == operator:
+        operands = []
+        for operand in expression[1:]:
+            operands.extend(flatten(operand, operator))
+        return operands
+    return [expression]
+
+
+def plan_query(expression, inverted_index, total_docs):
+    """
+    Строит план вычисления дерева запроса, полученного из parse_query.
+    Цепочки AND/OR раскрываются, операнды AND упорядочиваются по длине списков,
+    "a and not b" заменяется разностью вместо дополнения, заведомо пустые ветви отбрасываются.
+    :param expression: Дерево выражения.
+    :param inverted_index: Инвертированный индекс.
+    :param total_docs: Общее количество документов.
+    :return: Корневой узел плана.
+    """
+    if isinstance(expression, str):
+        term = expression.lower()
+        return PlanNode("term", term=term, estimate=document_frequency(inverted_index, term))
+
+    operator = expression[0]
+    if operator == "phrase":
+        terms = expression[1]
+        return PlanNode("positional", expression=expression,
+                        estimate=min(document_frequency(inverted_index, term) for term in terms))
+    if operator == "near":
+        _, _, left, right = expression
+        return PlanNode("positional", expression=expression,
+                        estimate=min(document_frequency(inverted_index, left),
+                                     document_frequency(inverted_index, right)))
+
+    if operator == "wildcard":
+        # Шаблон, раскрытый expand_wildcards: объединение подходящих терминов
+        return plan_union([plan_query(term, inverted_index, total_docs) for term in expression[2]], total_docs)
+
+    if operator == "not":
+        child = plan_query(expression[1], inverted_index, total_docs)
+        # Двойное отрицание: остается только ограничение множеством всех документов
+        if child.operator == "not":
+            grandchild = child.children[0]
+            return PlanNode("difference", [grandchild], estimate=grandchild.estimate)
+        return PlanNode("not", [child], estimate=max(total_docs - child.estimate, 0))
+
+    children = [plan_query(operand, inverted_index, total_docs) for operand in flatten(expression, operator)]
+
+    if operator == "or":
+        return plan_union(children, total_docs)
+
+    # AND: положительные операнды пересекаются, отрицания вычитаются из результата
+    positives = [child for child in children if child.operator != "not"]
+    negatives = [child.children[0] for child in children if child.operator == "not"]
+
+    # Для терминов и фраз оценка - точная верхняя граница, поэтому ноль означает пустой результат
+    if any(child.estimate == 0 and child.operator in ("term", "positional", "empty") for child in positives):
+        return PlanNode("empty")
+
+    if not positives:
+        # Только отрицания: not a and not b = not (a or b)
+        union = negatives[0] if len(negatives) == 1 else PlanNode(
+            "or", sorted(negatives, key=lambda child: child.estimate, reverse=True),
+            estimate=min(sum(child.estimate for child in negatives), total_docs),
+        )
+        return PlanNode("not", [union], estimate=max(total_docs - union.estimate, 0))
+
+    positives.sort(key=lambda child: child.estimate)
+    node = positives[0] if len(positives) == 1 else PlanNode("and", positives, estimate=positives[0].estimate)
+
+    if negatives:
+        negatives = [child for child in negatives if child.operator != "empty"]
+        negatives.sort(key=lambda child: child.estimate, reverse=True)
+        node = PlanNode("difference", [node] + negatives, estimate=node.estimate)
+    return node
+
+
+def plan_union(children, total_docs):
+    children = [child for child in children if child.operator != "empty"]
+    if not children:
+        return PlanNode("empty")
+    if len(children) == 1:
+        return children[0]
+    children.sort(key=lambda child: child.estimate, reverse=True)
+    return PlanNode("or", children, estimate=min(sum(child.estimate for child in children), total_docs))
+
+
+def gallop_intersect(small, large):
+    """
+    Пересечение короткого и длинного отсортированных списков: для каждого элемента
+    короткого списка позиция в длинном ищется экспоненциальным, затем двоичным поиском.
+    """
+    result = []
+    start = 0
+    size = len(large)
+    for value in small:
+        bound = 1
+        while start + bound < size and large[start + bound] < value:
+            bound *= 2
+        position = bisect_left(large, value, start + bound // 2, min(start + bound + 1, size))
+        if position >= size:
+            break
+        if large[position] == value:
+            result.append(value)
+        start = position
+    return result
+
+
+def merge_intersect(left, right):
+    result = []
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if left[i] < right[j]:
+            i += 1
+        elif left[i] > right[j]:
+            j += 1
+        else:
+            result.append(left[i])
+            i += 1
+            j += 1
+    return result
+
+
+def intersect(left, right):
+    if len(left) > len(right):
+        left, right = right, left
+    if len(left) * GALLOP_RATIO < len(right):
+        return gallop_intersect(left, right)
+    return merge_intersect(left, right)
+
+
+def execute_plan(node, inverted_index, total_docs, evaluate_leaf, live_docs=None):
+    """
+    Выполняет план.
+    :param node: Узел плана.
+    :param inverted_index: Инвертированный индекс.
+    :param total_docs: Общее количество документов.
+    :param evaluate_leaf: Функция, возвращающая множество документов для фраз и NEAR.
+    :param live_docs: Множество всех документов для NOT (по умолчанию range(total_docs)).
+    :return: Отсортированный список ID документов.
+    """
+    operator = node.operator
+    if operator == "term":
+        return postings_list(inverted_index, node.term)
+    if operator == "positional":
+        return sorted(evaluate_leaf(node.expression))
+    if operator == "empty":
+        return []
+
+    if operator == "and":
+        result = execute_plan(node.children[0], inverted_index, total_docs, evaluate_leaf, live_docs)
+        for child in node.children[1:]:
+            if not result:
+                break
+            result = intersect(result, execute_plan(child, inverted_index, total_docs, evaluate_leaf, live_docs))
+        return result
+
+    if operator == "or":
+        result = set()
+        for child in node.children:
+            result.update(execute_plan(child, inverted_index, total_docs, evaluate_leaf, live_docs))
+        return sorted(result)
+
+    if operator == "difference":
+        result = execute_plan(node.children[0], inverted_index, total_docs, evaluate_leaf, live_docs)
+        # a AND NOT b в set-движке - пересечение с дополнением b до множества всех документов
+        if live_docs is None:
+            result = [doc_id for doc_id in result if 0 <= doc_id < total_docs]
+        else:
+            result = [doc_id for doc_id in result if doc_id in live_docs]
+        for child in node.children[1:]:
+            if not result:
+                break
+            excluded = set(execute_plan(child, inverted_index, total_docs, evaluate_leaf, live_docs))
+            result = [doc_id for doc_id in result if doc_id not in excluded]
+        return result
+
+    # NOT: дополнение до множества всех документов, как и в set-движке
+    excluded = set(execute_plan(node.children[0], inverted_index, total_docs, evaluate_leaf, live_docs))
+    universe = range(total_docs) if live_docs is None else sorted(live_docs)
+    return [doc_id for doc_id in universe if doc_id not in excluded]
+
+
+def explain(node, indent=0):
+    """
+    Текстовое представление плана с оценками числа документов.
+    """
+    padding = "  " * indent
+    if node.operator == "term":
+        line = f'{padding}TERM "{node.term}" (df={node.estimate})'
+    elif node.operator == "positional":
+        line = f"{padding}POSITIONAL {node.expression} (~{node.estimate})"
+    else:
+        line = f"{padding}{node.operator.upper()} (~{node.estimate})"
+    lines = [line]
+    for child in node.children:
+        lines.append(explain(child, indent + 1))
+    return "\n".join(lines)
@@ -0,0 +1,131 @@
+import json
+import os
+from collections import defaultdict
+
+from task_2.term_counts import load_positions
+
+
+def build_positional_index(positions_dir):
+    """
+    Строит позиционный индекс из файлов позиций токенов.
+    :param positions_dir: Папка с файлами positions_{номер}.txt.
+    :return: Словарь токен -> {номер документа: разности позиций}.
+    """
+    positional_index = defaultdict(dict)
+
+    for filename in os.listdir(positions_dir):
+        doc_id = int(filename[len("positions_"):-len(".txt")])
+        for token, deltas in load_positions(os.path.join(positions_dir, filename)).items():
+            positional_index[token][doc_id] = deltas
+
+    return positional_index
+
+
+def save_positional_index(positional_index, path):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(positional_index, file, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_positional_index(path):
+    with open(path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    return {
+        token: {int(doc_id): deltas for doc_id, deltas in postings.items()}
+        for token, postings in data.items()
+    }
+
+
+def decode_positions(deltas):
+    """
+    Восстанавливает позиции из разностей.
+    """
+    positions = []
+    position = 0
+    for delta in deltas:
+        position += delta
+        positions.append(position)
+    return positions
+
+
+def match_offset(starts, positions, offset):
+    """
+    Оставляет начала фразы, для которых следующее слово стоит на позиции start + offset.
+    Оба списка отсортированы, поэтому достаточно одного прохода слиянием.
+    """
+    matched = []
+    i = j = 0
+    while i < len(starts) and j < len(positions):
+        target = starts[i] + offset
+        if positions[j] < target:
+            j += 1
+        elif positions[j] > target:
+            i += 1
+        else:
+            matched.append(starts[i])
+            i += 1
+            j += 1
+    return matched
+
+
+def within_distance(left, right, distance):
+    """
+    Проверяет, есть ли в двух отсортированных списках позиции на расстоянии не больше distance.
+    """
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if abs(left[i] - right[j]) <= distance:
+            return True
+        if left[i] < right[j]:
+            i += 1
+        else:
+            j += 1
+    return False
+
+
+def common_documents(postings):
+    # Пересекаем, начиная с самого короткого списка документов
+    postings = sorted(postings, key=len)
+    docs = set(postings[0])
+    for other in postings[1:]:
+        docs.intersection_update(other)
+    return docs
+
+
+def phrase_documents(positional_index, terms):
+    """
+    Документы, в которых слова встречаются подряд в заданном порядке.
+    :param positional_index: Позиционный индекс.
+    :param terms: Слова фразы.
+    :return: Множество номеров документов.
+    """
+    postings = [positional_index.get(term) for term in terms]
+    if not all(postings):
+        return set()
+
+    result = set()
+    for doc_id in common_documents(postings):
+        starts = decode_positions(postings[0][doc_id])
+        for offset, term_postings in enumerate(postings[1:], start=1):
+            starts = match_offset(starts, decode_positions(term_postings[doc_id]), offset)
+            if not starts:
+                break
+        if starts:
+            result.add(doc_id)
+    return result
+
+
+def near_documents(positional_index, left, right, distance):
+    """
+    Документы, в которых слова left и right стоят на расстоянии не больше distance (в любом порядке).
+    """
+    postings = [positional_index.get(left), positional_index.get(right)]
+    if not all(postings):
+        return set()
+
+    result = set()
+    for doc_id in common_documents(postings):
+        left_positions = decode_positions(postings[0][doc_id])
+        right_positions = decode_positions(postings[1][doc_id])
+        if within_distance(left_positions, right_positions, distance):
+            result.add(doc_id)
+    return result
@@ -0,0 +1,176 @@
+import re
+from collections import OrderedDict
+
+
+# Размеры кэшей: разобранные запросы, планы и результаты
+MAX_PARSED_QUERIES = 10000
+MAX_PLANS = 10000
+MAX_RESULTS = 10000
+
+
+class LRUCache:
+    """
+    Ограниченный LRU-кэш со счетчиками попаданий и промахов.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.cache.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.cache.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.cache[key] = value
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.cache),
+            "hit_rate": self.hits / total if total else 0,
+        }
+
+
+def canonicalize(expression):
+    """
+    Приводит дерево запроса к каноническому виду: термины в нижнем регистре,
+    цепочки AND/OR раскрыты, операнды отсортированы и без повторов,
+    слова NEAR упорядочены (оператор симметричен).
+    Эквивалентные запросы ("b AND a", "a and (b and a)") получают одно и то же дерево.
+    :param expression: Дерево выражения, построенное parse_query.
+    :return: Каноническое дерево (кортежи и строки, пригодные для ключа словаря).
+    """
+    if isinstance(expression, str):
+        return expression.lower()
+
+    operator, *operands = expression
+    if operator == 'phrase':
+        return ('phrase', tuple(word.lower() for word in operands[0]))
+    if operator == 'near':
+        distance, left, right = operands
+        left, right = sorted((left.lower(), right.lower()))
+        return ('near', distance, left, right)
+    if operator == 'not':
+        return ('not', canonicalize(operands[0]))
+    if operator == 'wildcard':
+        return ('wildcard', operands[0].lower())
+
+    flat = []
+    for operand in operands:
+        operand = canonicalize(operand)
+        if isinstance(operand, tuple) and operand[0] == operator:
+            flat.extend(operand[1:])
+        else:
+            flat.append(operand)
+    # Повторы операнда не меняют результат AND и OR
+    flat = sorted(set(flat), key=repr)
+    if len(flat) == 1:
+        return flat[0]
+    return (operator,) + tuple(flat)
+
+
+def index_version(index):
+    """
+    Версия индекса для ключа кэша: sha256 содержимого у двоичного индекса,
+    иначе идентификатор объекта (перестроенный индекс - новый объект).
+    """
+    if index is None:
+        return None
+    version = getattr(index, "version", None)
+    if version is not None:
+        return version
+    return id(index)
+
+
+class QueryCache:
+    """
+    Кэш булева поиска: разобранные запросы, планы и множества документов.
+    Планы и результаты хранятся под версией индекса, поэтому после перестроения
+    индекса старые записи не используются и со временем вытесняются.
+    :param parse: Функция разбора строки запроса в дерево (parse_query).
+    """
+
+    def __init__(self, parse, max_parsed=MAX_PARSED_QUERIES, max_plans=MAX_PLANS, max_results=MAX_RESULTS):
+        self.parse_function = parse
+        self.parsed = LRUCache(max_parsed)
+        self.plans = LRUCache(max_plans)
+        self.results = LRUCache(max_results)
+
+    def parse(self, query):
+        """
+        Возвращает каноническое дерево запроса.
+        """
+        key = " ".join(re.findall(r'\S+', query.lower()))
+        expression = self.parsed.get(key)
+        if expression is None:
+            expression = canonicalize(self.parse_function(key))
+            self.parsed.put(key, expression)
+        return expression
+
+    def _key(self, expression, inverted_index, total_docs, positional_index=None, live_docs=None):
+        return (index_version(inverted_index), index_version(positional_index), index_version(live_docs),
+                total_docs, expression)
+
+    def _owners(self, inverted_index, positional_index, live_docs=None):
+        # Индексы без версии кэшируются по id(); ссылка на них сохраняется вместе с записью,
+        # чтобы идентификатор не мог достаться другому объекту
+        return tuple(
+            index for index in (inverted_index, positional_index, live_docs)
+            if index is not None and getattr(index, "version", None) is None
+        )
+
+    def _get(self, cache, key, owners):
+        cached = cache.get(key)
+        if cached is None:
+            return None
+        if len(cached[0]) != len(owners) or any(a is not b for a, b in zip(cached[0], owners)):
+            cache.hits -= 1
+            cache.misses += 1
+            return None
+        return cached[1]
+
+    def get_plan(self, expression, inverted_index, total_docs):
+        owners = self._owners(inverted_index, None)
+        return self._get(self.plans, self._key(expression, inverted_index, total_docs), owners)
+
+    def put_plan(self, expression, inverted_index, total_docs, plan):
+        owners = self._owners(inverted_index, None)
+        self.plans.put(self._key(expression, inverted_index, total_docs), (owners, plan))
+
+    def get_result(self, expression, inverted_index, total_docs, positional_index=None, live_docs=None):
+        owners = self._owners(inverted_index, positional_index, live_docs)
+        key = self._key(expression, inverted_index, total_docs, positional_index, live_docs)
+        return self._get(self.results, key, owners)
+
+    def put_result(self, expression, inverted_index, total_docs, positional_index, live_docs, result):
+        owners = self._owners(inverted_index, positional_index, live_docs)
+        key = self._key(expression, inverted_index, total_docs, positional_index, live_docs)
+        self.results.put(key, (owners, frozenset(result)))
+
+    def clear(self):
+        self.parsed.clear()
+        self.plans.clear()
+        self.results.clear()
+
+    def stats(self):
+        return {
+            "parsed": self.parsed.stats(),
+            "plans": self.plans.stats(),
+            "results": self.results.stats(),
+        }
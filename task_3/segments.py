@@ -0,0 +1,448 @@
+"""
+Сегментный индекс: новые и измененные документы записываются в небольшие новые
+сегменты, удаленные помечаются в битовой карте удалений своего сегмента.
+Поиск идет по всем сегментам, фоновое слияние объединяет мелкие сегменты.
+
+Пример: python segments.py --changed          # добавить документы, измененные с прошлого обновления
+        python segments.py --delete 12 40     # удалить документы
+        python segments.py --merge --query "гарри and not рон"
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+import threading
+from collections import Counter
+from collections.abc import Mapping
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_2.main import load_processed_hashes
+from task_2.term_counts import load_term_counts
+from task_3.binary_index import BinaryIndexReader, write_binary_index
+from task_3.bitmap_engine import to_bitmap
+
+
+# Получаем путь к родительской папке
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEGMENTS_DIR = os.path.join(parent_dir, "task_3/segments")
+COUNTS_DIR = os.path.join(parent_dir, "task_2/counts")
+LEMMAS_DIR = os.path.join(parent_dir, "task_2/lemmas")
+PROCESSED_FILE = os.path.join(parent_dir, "task_2/processed.json")
+MANIFEST_FILE = "segments.json"
+
+# Политика слияния: при числе сегментов больше MAX_SEGMENTS сливаются MERGE_FACTOR самых маленьких,
+# сегмент, в котором удалено больше MAX_DELETED_RATIO документов, переписывается
+MAX_SEGMENTS = 8
+MERGE_FACTOR = 4
+MAX_DELETED_RATIO = 0.3
+# Период проверки политики слияния фоновым потоком, секунды
+MERGE_INTERVAL = 5
+
+
+def load_document(doc_id, counts_dir=COUNTS_DIR, lemmas_dir=LEMMAS_DIR):
+    """
+    Читает документ из результатов task_2.
+    :return: Кортеж (длина документа, частоты токенов, частоты лемм).
+    """
+    length, token_counts = load_term_counts(os.path.join(counts_dir, f"counts_{doc_id}.txt"))
+    lemma_counts = {}
+    with open(os.path.join(lemmas_dir, f"lemmas_{doc_id}.txt"), "r", encoding="utf-8") as file:
+        for line in file:
+            lemma, *forms = line.split()
+            lemma_counts[lemma] = sum(token_counts.get(form, 0) for form in forms)
+    return length, dict(token_counts), lemma_counts
+
+
+class Segment:
+    """
+    Неизменяемый сегмент: двоичный инвертированный индекс токенов и частоты терминов документов.
+    Удаление документов создает новый объект с другой битовой картой удалений,
+    поэтому запрос, начатый до удаления, видит согласованное состояние.
+    """
+
+    def __init__(self, directory, name, doc_ids, deleted=0, reader=None):
+        self.directory = directory
+        self.name = name
+        self.doc_ids = doc_ids
+        self.deleted = deleted
+        self.reader = reader or BinaryIndexReader(os.path.join(directory, f"{name}.bin"))
+        self._documents = None
+        self._df = {}
+
+    def with_deleted(self, doc_ids):
+        segment = Segment(self.directory, self.name, self.doc_ids, self.deleted | to_bitmap(doc_ids), self.reader)
+        segment._documents = self._documents
+        return segment
+
+    def is_deleted(self, doc_id):
+        return self.deleted >> doc_id & 1 == 1
+
+    def live_doc_ids(self):
+        return [doc_id for doc_id in self.doc_ids if not self.is_deleted(doc_id)]
+
+    def documents(self):
+        """
+        Частоты терминов документов сегмента (читаются при первом обращении).
+        :return: Словарь номер документа -> (длина, частоты токенов, частоты лемм).
+        """
+        if self._documents is None:
+            with open(os.path.join(self.directory, f"{self.name}.json"), "r", encoding="utf-8") as file:
+                self._documents = {int(doc_id): tuple(document) for doc_id, document in json.load(file).items()}
+        return self._documents
+
+    def term_document_frequencies(self, position):
+        """
+        df терминов по живым документам сегмента. Считается один раз: удаление создает новый объект сегмента.
+        :param position: 1 - токены, 2 - леммы (позиция частот в записи документа).
+        """
+        df = self._df.get(position)
+        if df is None:
+            documents = self.documents()
+            df = Counter()
+            for doc_id in self.live_doc_ids():
+                df.update(documents[doc_id][position].keys())
+            self._df[position] = df
+        return df
+
+    def postings(self, term):
+        postings = self.reader.postings(term)
+        if self.deleted:
+            postings = [doc_id for doc_id in postings if not self.is_deleted(doc_id)]
+        return postings
+
+    def document_frequency(self, term):
+        if self.deleted:
+            return len(self.postings(term))
+        return self.reader.document_frequency(term)
+
+
+def write_segment(directory, name, documents):
+    """
+    Записывает сегмент: {name}.bin - инвертированный индекс токенов, {name}.json - частоты терминов.
+    :param documents: Словарь номер документа -> (длина, частоты токенов, частоты лемм).
+    """
+    inverted_index = {}
+    for doc_id, (_, token_counts, _) in documents.items():
+        for token in token_counts:
+            inverted_index.setdefault(token, set()).add(doc_id)
+    write_binary_index(inverted_index, os.path.join(directory, f"{name}.bin"))
+    with open(os.path.join(directory, f"{name}.json"), "w", encoding="utf-8") as file:
+        json.dump({str(doc_id): list(document) for doc_id, document in sorted(documents.items())},
+                  file, ensure_ascii=False, separators=(",", ":"))
+
+
+class SegmentedIndex(Mapping):
+    """
+    Индекс из нескольких сегментов. Ведет себя как инвертированный индекс
+    (термин -> множество живых документов), поэтому подходит для boolean_search.
+    Состояние (список сегментов, удаленные документы и sha256 страниц, по которым task_2 получил
+    частоты документов) хранится в segments.json и заменяется атомарно.
+    """
+
+    def __init__(self, directory=SEGMENTS_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.RLock()
+        self.merge_thread = None
+        self.stop_event = threading.Event()
+        self._live_docs = None
+        self._tf_idf = {}
+
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        manifest = {"next_segment": 1, "segments": [], "hashes": {}}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        self.next_segment = manifest["next_segment"]
+        self.segments = [
+            Segment(directory, entry["name"], entry["docs"], to_bitmap(entry["deleted"]))
+            for entry in manifest["segments"]
+        ]
+        self.hashes = {int(doc_id): sha256 for doc_id, sha256 in manifest.get("hashes", {}).items()}
+        self.version = self._version(manifest)
+
+    @staticmethod
+    def _version(manifest):
+        return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _commit(self, segments):
+        """
+        Сохраняет новый список сегментов. Вызывается под блокировкой.
+        """
+        manifest = {
+            "next_segment": self.next_segment,
+            "segments": [
+                {"name": segment.name, "docs": segment.doc_ids,
+                 "deleted": [doc_id for doc_id in segment.doc_ids if segment.is_deleted(doc_id)]}
+                for segment in segments
+            ],
+            "hashes": {str(doc_id): self.hashes[doc_id] for doc_id in sorted(self.hashes)},
+        }
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+        os.replace(path + ".tmp", path)
+        self.segments = segments
+        self.version = self._version(manifest)
+        self._live_docs = None
+        self._tf_idf = {}
+
+    def _new_segment_name(self):
+        name = f"segment_{self.next_segment:06d}"
+        self.next_segment += 1
+        return name
+
+    def add_documents(self, documents, hashes=None):
+        """
+        Добавляет новые или измененные документы отдельным сегментом.
+        Прежние версии документов помечаются удаленными в своих сегментах.
+        :param documents: Словарь номер документа -> (длина, частоты токенов, частоты лемм).
+        :param hashes: Словарь номер документа -> sha256 страницы (из task_2/processed.json);
+        документ без хэша будет считаться измененным при следующем --changed.
+        """
+        if not documents:
+            return
+        with self.lock:
+            name = self._new_segment_name()
+            write_segment(self.directory, name, documents)
+            for doc_id in documents:
+                if hashes and doc_id in hashes:
+                    self.hashes[doc_id] = hashes[doc_id]
+                else:
+                    self.hashes.pop(doc_id, None)
+            segments = self._without(self.segments, documents)
+            segments.append(Segment(self.directory, name, sorted(documents)))
+            self._commit(segments)
+
+    def delete_documents(self, doc_ids):
+        with self.lock:
+            for doc_id in doc_ids:
+                self.hashes.pop(doc_id, None)
+            self._commit(self._without(self.segments, doc_ids))
+
+    @staticmethod
+    def _without(segments, doc_ids):
+        doc_ids = set(doc_ids)
+        result = []
+        for segment in segments:
+            removed = [doc_id for doc_id in segment.doc_ids if doc_id in doc_ids and not segment.is_deleted(doc_id)]
+            result.append(segment.with_deleted(removed) if removed else segment)
+        return result
+
+    def live_docs(self):
+        """
+        Множество живых документов. Объект не меняется до следующего изменения индекса,
+        поэтому его можно передавать в boolean_search(..., live_docs=...) вместе с кэшем запросов.
+        """
+        live_docs = self._live_docs
+        if live_docs is None:
+            live_docs = frozenset(doc_id for segment in self.segments for doc_id in segment.live_doc_ids())
+            self._live_docs = live_docs
+        return live_docs
+
+    def postings(self, term):
+        """
+        Отсортированный список живых документов термина по всем сегментам.
+        """
+        postings = []
+        for segment in self.segments:
+            postings.extend(segment.postings(term))
+        return sorted(postings)
+
+    def document_frequency(self, term):
+        return sum(segment.document_frequency(term) for segment in self.segments)
+
+    def __getitem__(self, term):
+        postings = self.postings(term)
+        if not postings:
+            raise KeyError(term)
+        return set(postings)
+
+    def __iter__(self):
+        seen = set()
+        for segment in self.segments:
+            for term in segment.reader:
+                if term not in seen and segment.document_frequency(term):
+                    seen.add(term)
+                    yield term
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def live_documents(self):
+        """
+        Частоты терминов живых документов всех сегментов.
+        :return: Словарь номер документа -> (длина, частоты токенов, частоты лемм).
+        """
+        documents = {}
+        for segment in self.segments:
+            segment_documents = segment.documents()
+            for doc_id in segment.live_doc_ids():
+                documents[doc_id] = segment_documents[doc_id]
+        return documents
+
+    def tf_idf(self, level="lemmas"):
+        """
+        TF-IDF живых документов всех сегментов в формате task_5 (номер документа -> {термин: tf * idf}).
+        tf и idf считаются так же, как в task_4: tf = частота / длина документа, idf = log(N / df).
+        df суммируется из df сегментов, результат хранится до следующего изменения индекса
+        (не изменяйте возвращаемый словарь).
+        :param level: "tokens" или "lemmas".
+        """
+        with self.lock:
+            segments = self.segments
+            tf_idf = self._tf_idf.get(level)
+        if tf_idf is not None:
+            return tf_idf
+
+        position = 1 if level == "tokens" else 2
+        total_docs = 0
+        df = Counter()
+        for segment in segments:
+            total_docs += len(segment.live_doc_ids())
+            df.update(segment.term_document_frequencies(position))
+        idf = {term: math.log(total_docs / term_df) for term, term_df in df.items()}
+
+        tf_idf = {}
+        for segment in segments:
+            segment_documents = segment.documents()
+            for doc_id in segment.live_doc_ids():
+                length, counts = segment_documents[doc_id][0], segment_documents[doc_id][position]
+                tf_idf[doc_id] = {term: count / length * idf[term] for term, count in counts.items()}
+
+        # Индекс мог измениться во время расчета: такой результат не сохраняется
+        with self.lock:
+            if self.segments is segments:
+                self._tf_idf[level] = tf_idf
+        return tf_idf
+
+    def select_merge(self):
+        """
+        Политика слияния.
+        :return: Имена сегментов для слияния или пустой список.
+        """
+        segments = self.segments
+        for segment in segments:
+            live = len(segment.live_doc_ids())
+            if segment.deleted and live < len(segment.doc_ids) * (1 - MAX_DELETED_RATIO):
+                return [segment.name]
+        if len(segments) > MAX_SEGMENTS:
+            smallest = sorted(segments, key=lambda segment: len(segment.live_doc_ids()))[:MERGE_FACTOR]
+            return [segment.name for segment in smallest]
+        return []
+
+    def merge(self, names=None):
+        """
+        Сливает сегменты в один, отбрасывая удаленные документы.
+        Тяжелая часть выполняется без блокировки, поэтому поиск и добавление документов
+        не останавливаются; удаления, сделанные во время слияния, переносятся в новый сегмент.
+        :param names: Имена сегментов (по умолчанию выбираются политикой слияния).
+        :return: True, если слияние выполнено.
+        """
+        with self.lock:
+            if names is None:
+                names = self.select_merge()
+            sources = [segment for segment in self.segments if segment.name in names]
+            if not sources or (len(sources) == 1 and not sources[0].deleted):
+                return False
+            name = self._new_segment_name()
+
+        documents = {}
+        for segment in sources:
+            segment_documents = segment.documents()
+            for doc_id in segment.live_doc_ids():
+                documents[doc_id] = segment_documents[doc_id]
+        if documents:
+            write_segment(self.directory, name, documents)
+
+        with self.lock:
+            current = {segment.name: segment for segment in self.segments}
+            if any(segment.name not in current for segment in sources):
+                # Сегменты уже слиты другим вызовом
+                return False
+            deleted_since = [
+                doc_id for segment in sources for doc_id in segment.doc_ids
+                if current[segment.name].is_deleted(doc_id) and not segment.is_deleted(doc_id)
+            ]
+            source_names = {segment.name for segment in sources}
+            segments = [segment for segment in self.segments if segment.name not in source_names]
+            if documents:
+                merged = Segment(self.directory, name, sorted(documents))
+                segments.append(merged.with_deleted(deleted_since) if deleted_since else merged)
+            self._commit(segments)
+
+        for segment in sources:
+            for extension in (".bin", ".json"):
+                try:
+                    os.remove(os.path.join(self.directory, segment.name + extension))
+                except OSError:
+                    pass
+        return True
+
+    def start_merging(self, interval=MERGE_INTERVAL):
+        """
+        Запускает фоновый поток, который сливает сегменты по политике слияния.
+        """
+        if self.merge_thread is not None:
+            return
+        self.stop_event.clear()
+
+        def run():
+            while not self.stop_event.wait(interval):
+                while self.merge():
+                    pass
+
+        self.merge_thread = threading.Thread(target=run, name="segment-merge", daemon=True)
+        self.merge_thread.start()
+
+    def stop_merging(self):
+        if self.merge_thread is None:
+            return
+        self.stop_event.set()
+        self.merge_thread.join()
+        self.merge_thread = None
+
+
+if __name__ == "__main__":
+    from task_3.main import boolean_search
+
+    parser = argparse.ArgumentParser(description="Инкрементальное обновление сегментного индекса")
+    parser.add_argument("--add", type=int, nargs="*", default=[], help="добавить или обновить документы")
+    parser.add_argument("--changed", action="store_true",
+                        help="добавить новые и измененные документы и удалить исчезнувшие "
+                             "(по sha256 страниц в task_2/processed.json)")
+    parser.add_argument("--delete", type=int, nargs="*", default=[], help="удалить документы")
+    parser.add_argument("--merge", action="store_true", help="слить сегменты по политике слияния")
+    parser.add_argument("--query", help="выполнить булев запрос по сегментам")
+    args = parser.parse_args()
+
+    index = SegmentedIndex()
+
+    # Хэши страниц, по которым task_2 получил частоты документов. Изменения определяются сравнением
+    # с хэшами документов индекса, как в task_2 --changed-only: учитываются все обходы с прошлого обновления
+    processed_hashes = load_processed_hashes(PROCESSED_FILE) or {}
+
+    doc_ids = set(args.add)
+    deleted = set(args.delete)
+    if args.changed:
+        if not processed_hashes:
+            raise FileNotFoundError(f"Нет хэшей документов {PROCESSED_FILE}: запустите task_2 (python main.py)")
+        doc_ids.update(doc_id for doc_id, sha256 in processed_hashes.items() if index.hashes.get(doc_id) != sha256)
+        deleted.update(index.live_docs() - processed_hashes.keys())
+    index.add_documents({doc_id: load_document(doc_id) for doc_id in sorted(doc_ids)}, processed_hashes)
+    if deleted:
+        index.delete_documents(sorted(deleted))
+    if args.merge:
+        while index.merge():
+            pass
+
+    live_docs = index.live_docs()
+    print(f"Сегментов: {len(index.segments)}, документов: {len(live_docs)}")
+
+    if args.query:
+        result = boolean_search(args.query.lower(), index, len(live_docs), live_docs=live_docs)
+        print(f"Документы: {', '.join(map(str, sorted(result)))}")
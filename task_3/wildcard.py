@@ -0,0 +1,151 @@
+import re
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+
+from task_3.binary_index import BinaryIndexReader
+
+
+# Максимальное число терминов, в которое может раскрыться один шаблон
+MAX_EXPANSIONS = 1000
+# Длина k-грамм для поиска по суффиксу и подстроке
+KGRAM_LENGTH = 3
+# Сколько словарей терминов хранить одновременно (по одному на инвертированный индекс)
+MAX_CACHED_DICTIONARIES = 4
+
+
+class TermDictionary:
+    """
+    Словарь терминов индекса для раскрытия шаблонов с *.
+    Префиксные шаблоны (гриф*) ищутся двоичным поиском по отсортированным терминам
+    (для двоичного индекса - прямо по его лексикону), остальные (*дор, *ерми*) -
+    по k-граммному индексу, который строится при первом таком шаблоне.
+    """
+
+    def __init__(self, inverted_index):
+        self.inverted_index = inverted_index
+        self.terms = None
+        self.kgrams = None
+
+    def sorted_terms(self):
+        if self.terms is None:
+            self.terms = sorted(self.inverted_index)
+        return self.terms
+
+    def prefix(self, prefix, limit):
+        """
+        Термины, начинающиеся с prefix.
+        :param limit: Максимальное количество терминов; при превышении - ValueError.
+        """
+        if isinstance(self.inverted_index, BinaryIndexReader):
+            reader = self.inverted_index
+            position = reader.lower_bound(prefix.encode("utf-8"))
+            terms = []
+            while position < reader.term_count:
+                term = reader.term_at(position)
+                if not term.startswith(prefix):
+                    break
+                terms.append(term)
+                check_limit(prefix + "*", len(terms), limit)
+                position += 1
+            return terms
+
+        terms = self.sorted_terms()
+        position = bisect_left(terms, prefix)
+        result = []
+        while position < len(terms) and terms[position].startswith(prefix):
+            result.append(terms[position])
+            check_limit(prefix + "*", len(result), limit)
+            position += 1
+        return result
+
+    def kgram_index(self):
+        """
+        k-граммный индекс: k-грамма -> множество номеров терминов в sorted_terms().
+        Начало и конец термина отмечаются символом $.
+        """
+        if self.kgrams is None:
+            kgrams = defaultdict(set)
+            for number, term in enumerate(self.sorted_terms()):
+                for kgram in term_kgrams(f"${term}$"):
+                    kgrams[kgram].add(number)
+            self.kgrams = kgrams
+        return self.kgrams
+
+    def match(self, pattern, limit):
+        """
+        Термины, подходящие под шаблон с * в любом месте.
+        :param limit: Максимальное количество терминов; при превышении - ValueError.
+        """
+        kgrams = [kgram for piece in f"${pattern}$".split("*") for kgram in term_kgrams(piece)]
+        terms = self.sorted_terms()
+        if kgrams:
+            index = self.kgram_index()
+            postings = sorted((index.get(kgram, set()) for kgram in kgrams), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            candidates = [terms[number] for number in sorted(candidates)]
+        else:
+            # Части шаблона короче k-граммы (например, *а*): проверяются все термины
+            candidates = terms
+
+        # k-граммы не учитывают порядок частей, поэтому кандидаты проверяются по шаблону
+        regex = re.compile(".*".join(re.escape(piece) for piece in pattern.split("*")))
+        result = []
+        for term in candidates:
+            if regex.fullmatch(term):
+                result.append(term)
+                check_limit(pattern, len(result), limit)
+        return result
+
+    def expand(self, pattern, limit=MAX_EXPANSIONS):
+        """
+        Раскрывает шаблон в список терминов индекса.
+        """
+        pattern = pattern.lower()
+        if pattern.endswith("*") and "*" not in pattern[:-1]:
+            return self.prefix(pattern[:-1], limit)
+        return self.match(pattern, limit)
+
+
+def term_kgrams(text, length=KGRAM_LENGTH):
+    return [text[start:start + length] for start in range(len(text) - length + 1)]
+
+
+def check_limit(pattern, count, limit):
+    if count > limit:
+        raise ValueError(f"Шаблон {pattern} раскрывается больше чем в {limit} терминов")
+
+
+# Словари терминов по идентификатору и версии инвертированного индекса. Ссылка на сам индекс
+# хранится вместе со словарем, чтобы идентификатор не мог достаться другому объекту
+_dictionaries = OrderedDict()
+
+
+def get_term_dictionary(inverted_index):
+    """
+    Возвращает словарь терминов для инвертированного индекса, создавая его при первом обращении.
+    """
+    key = (id(inverted_index), getattr(inverted_index, "version", None))
+    cached = _dictionaries.get(key)
+    if cached is not None and cached[0] is inverted_index:
+        _dictionaries.move_to_end(key)
+        return cached[1]
+
+    dictionary = TermDictionary(inverted_index)
+    _dictionaries[key] = (inverted_index, dictionary)
+    if len(_dictionaries) > MAX_CACHED_DICTIONARIES:
+        _dictionaries.popitem(last=False)
+    return dictionary
+
+
+def expand_wildcards(expression, inverted_index, limit=MAX_EXPANSIONS):
+    """
+    Заменяет шаблоны ('wildcard', шаблон) в дереве запроса на ('wildcard', шаблон, термины).
+    """
+    if isinstance(expression, str):
+        return expression
+    operator, *operands = expression
+    if operator == 'wildcard':
+        return ('wildcard', operands[0], tuple(get_term_dictionary(inverted_index).expand(operands[0], limit)))
+    if operator in ('and', 'or', 'not'):
+        return (operator,) + tuple(expand_wildcards(operand, inverted_index, limit) for operand in operands)
+    return expression
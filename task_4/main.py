@@ -1,8 +1,15 @@
-import json
 import os
+import sys
 import math
-from collections import Counter
-from task_2.main import clean_html, tokenize, filter_tokens
+import numpy as np
+from scipy.sparse import csr_matrix
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_1.page_store import count_documents
+from task_2.term_counts import load_term_counts
+from task_3.lemma_index import build_lemma_index, load_lemma_index
+from task_4.tf_idf_matrix import MATRIX_DIR, write_tf_idf_matrix
 
 # Путь к родительской папке
 parent_dir = os.path.dirname(os.getcwd())
@@ -10,70 +17,130 @@ parent_dir = os.path.dirname(os.getcwd())
 # Пути к папкам
 TOKENS_DIR = os.path.join(parent_dir, "task_2/tokens")
 LEMMAS_DIR = os.path.join(parent_dir, "task_2/lemmas")
+COUNTS_DIR = os.path.join(parent_dir, "task_2/counts")
 PAGES_DIR = os.path.join(parent_dir, "task_1/pages")
-INVERTED_LEMMAS_DIR = os.path.join(parent_dir, "task_3/inverted_index.json")
+PAGE_STORE_PREFIX = os.path.join(parent_dir, "task_1/pages")
+LEMMA_INDEX_FILE = os.path.join(parent_dir, "task_3/lemma_index.json")
 
 # Общее количество документов
-N = len(os.listdir(PAGES_DIR))
-
-# Загрузка инвертированного списка
-with open(INVERTED_LEMMAS_DIR, "r", encoding="utf-8") as file:
-    inverted_index = json.load(file)
+N = count_documents(PAGES_DIR, PAGE_STORE_PREFIX)
+
+# Индекс лемм с посчитанными df и idf (если task_3 его не построил, строим по файлам лемм)
+if os.path.exists(LEMMA_INDEX_FILE):
+    lemma_index = load_lemma_index(LEMMA_INDEX_FILE)
+else:
+    lemma_index = build_lemma_index(LEMMAS_DIR, N)
+
+
+# Матрица частот токенов: строка - документ, столбец - токен
+def load_count_matrix(doc_ids, counts_dir=COUNTS_DIR):
+    """
+    Читает частоты токенов, посчитанные в task_2, в разреженную матрицу CSR.
+    :param doc_ids: Номера документов (порядок строк матрицы).
+    :param counts_dir: Папка с файлами counts_{номер}.txt.
+    :return: Кортеж (отсортированный список токенов, матрица частот, массив длин документов).
+    """
+    if not os.path.isdir(counts_dir):
+        raise FileNotFoundError(f"Нет частот токенов {counts_dir}: запустите task_2 (python main.py)")
+    vocabulary = {}
+    indptr = [0]
+    indices = []
+    data = []
+    lengths = []
+    for doc_id in doc_ids:
+        length, counter = load_term_counts(os.path.join(counts_dir, f"counts_{doc_id}.txt"))
+        for token, count in counter.items():
+            indices.append(vocabulary.setdefault(token, len(vocabulary)))
+            data.append(count)
+        indptr.append(len(indices))
+        lengths.append(length)
+
+    # Столбцы нумеруются в порядке сортировки токенов, как в файлах токенов task_2
+    tokens = sorted(vocabulary)
+    column = np.empty(len(tokens), dtype=np.int64)
+    column[[vocabulary[token] for token in tokens]] = np.arange(len(tokens))
+
+    matrix = csr_matrix(
+        (np.array(data, dtype=np.float64), column[np.array(indices, dtype=np.int64)], np.array(indptr)),
+        shape=(len(doc_ids), len(tokens)),
+    )
+    matrix.sort_indices()
+    return tokens, matrix, np.array(lengths, dtype=np.float64)
+
+
+# Матрица соответствия токенов леммам
+def load_lemma_mapping(doc_ids, tokens, lemmas_dir=LEMMAS_DIR):
+    """
+    Строит разреженную матрицу токен -> лемма по файлам лемм task_2.
+    :return: Кортеж (отсортированный список лемм, матрица размера токены x леммы из единиц).
+    """
+    token_lemmas = {}
+    for doc_id in doc_ids:
+        with open(os.path.join(lemmas_dir, f"lemmas_{doc_id}.txt"), "r", encoding="utf-8") as file:
+            for line in file:
+                lemma, *forms = line.split()
+                for form in forms:
+                    token_lemmas[form] = lemma
+
+    lemmas = sorted(set(token_lemmas.values()))
+    lemma_ids = {lemma: number for number, lemma in enumerate(lemmas)}
+    rows = []
+    columns = []
+    for number, token in enumerate(tokens):
+        lemma = token_lemmas.get(token)
+        if lemma is not None:
+            rows.append(number)
+            columns.append(lemma_ids[lemma])
+
+    mapping = csr_matrix(
+        (np.ones(len(rows)), (np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64))),
+        shape=(len(tokens), len(lemmas)),
+    )
+    return lemmas, mapping
 
 
 # Функция для подсчета TF
-def calculate_tf(tokens, all_tokens_count, all_tokens_counter):
-
-    # Расчет TF для каждого токена
-    tf = {}
-    for token in tokens:
-        temp_tf = all_tokens_counter.get(token, 0) / all_tokens_count
-        tf[token] = temp_tf
-
+def calculate_tf(count_matrix, lengths):
+    # TF = частота / длина документа; делится каждый элемент строки на длину ее документа
+    tf = count_matrix.copy()
+    tf.data = tf.data / np.repeat(lengths, np.diff(tf.indptr))
     return tf
 
 
 # Функция для подсчета IDF
-def calculate_idf(tokens, inverted_index, N):
-    idf = {}
-    for token in tokens:
-        doc_ids = inverted_index.get(token, set())
-        temp_idf = math.log(N / len(doc_ids)) if len(doc_ids) > 0 else 0
-        idf[token] = temp_idf
-
-    return idf
+def calculate_idf(count_matrix, N):
+    # df - число ненулевых элементов в столбце; log считается math.log, как и раньше
+    df = np.bincount(count_matrix.indices, minlength=count_matrix.shape[1])
+    idf_by_df = {value: math.log(N / value) if value > 0 else 0 for value in set(df.tolist())}
+    return np.array([idf_by_df[value] for value in df.tolist()])
 
 
 # Функция для подсчета TF для лемм
-def calculate_tf_for_lemmas(tf_tokens, lemmas):
-    tf = {}
-
-    for lemma in lemmas:
-        lemma, *lemmas_tokens = lemma.split()
-        sum_tf = 0
-        for token in lemmas_tokens:
-            if token in tf_tokens:
-                sum_tf += tf_tokens[token]
-        tf[lemma] = sum_tf
-
+def calculate_tf_for_lemmas(tf_tokens, mapping):
+    # Сумма TF словоформ каждой леммы: произведение на матрицу соответствия
+    tf = (tf_tokens @ mapping).tocsr()
+    tf.sort_indices()
     return tf
 
 
 # Функция для подсчета IDF для лемм
-def calculate_idf_for_lemmas(lemmas, inverted_index, N):
-    idf = {}
+def calculate_idf_for_lemmas(lemmas, lemma_index):
+    idf = []
     for lemma in lemmas:
-        lemma, *lemmas_tokens = lemma.split()
-        doc_ids = set()
-        for token in lemmas_tokens:
-            token_doc_ids = inverted_index.get(token, set())
-            token_doc_ids = set(token_doc_ids)
-            doc_ids.update(token_doc_ids)
+        entry = lemma_index.get(lemma)
+        idf.append(entry["idf"] if entry is not None else 0)
 
-        temp_idf = math.log(N / len(doc_ids)) if len(doc_ids) > 0 else 0
-        idf[lemma] = temp_idf
+    return np.array(idf)
 
-    return idf
+
+def format_row(matrix, row, terms, idf):
+    """
+    Строки "термин tf idf" для ненулевых элементов строки матрицы.
+    """
+    start, end = matrix.indptr[row], matrix.indptr[row + 1]
+    columns = matrix.indices[start:end].tolist()
+    values = matrix.data[start:end].tolist()
+    return "".join(f"{terms[column]} {value} {idf[column]}\n" for column, value in zip(columns, values))
 
 
 if __name__ == '__main__':
@@ -85,59 +152,36 @@ if __name__ == '__main__':
     os.makedirs(tokens_dir, exist_ok=True)
     os.makedirs(lemmas_dir, exist_ok=True)
 
-    # Основной цикл обработки документов
-    for doc_id in range(1, N + 1):
-        # Чтение токенов
-        with open(os.path.join(TOKENS_DIR, f"tokens_{doc_id}.txt"), "r", encoding="utf-8") as f:
-            tokens = f.read().splitlines()
-
-        # Чтение лемм
-        with open(os.path.join(LEMMAS_DIR, f"lemmas_{doc_id}.txt"), "r", encoding="utf-8") as f:
-            lemmas = f.readlines()
-
-        with open(os.path.join(PAGES_DIR, f"{doc_id}.html"), "r", encoding="utf-8") as f:
-            html = f.read()
-            clean_text = clean_html(html)
-
-        all_tokens_in_text = filter_tokens(tokenize(clean_text))
-
-        all_tokens_count = len(all_tokens_in_text)
-        all_tokens_counter = Counter(all_tokens_in_text)
+    doc_ids = list(range(1, N + 1))
 
-        # Расчет TF для токенов
-        tf_tokens = calculate_tf(tokens, all_tokens_count, all_tokens_counter)
+    # Чтение длин документов и частот токенов, посчитанных в task_2
+    tokens, count_matrix, lengths = load_count_matrix(doc_ids)
+    lemmas, mapping = load_lemma_mapping(doc_ids, tokens)
 
-        # Расчет IDF для токенов
-        idf_tokens = calculate_idf(tokens, inverted_index, N)
+    # Расчет TF и IDF для токенов
+    tf_tokens = calculate_tf(count_matrix, lengths)
+    idf_tokens = calculate_idf(count_matrix, N).tolist()
 
-        # Расчет TF для лемм
-        tf_lemmas = calculate_tf_for_lemmas(tf_tokens, lemmas)
+    # Расчет TF и IDF для лемм
+    tf_lemmas = calculate_tf_for_lemmas(tf_tokens, mapping)
+    counts_lemmas = (count_matrix @ mapping).tocsr()
+    idf_lemmas = calculate_idf_for_lemmas(lemmas, lemma_index).tolist()
 
-        # Расчет IDF для лемм
-        idf_lemmas = calculate_idf_for_lemmas(lemmas, inverted_index, N)
-
-        # Вывод результатов
+    # Вывод результатов
+    for row, doc_id in enumerate(doc_ids):
         output_tokens_file = os.path.join(tokens_dir, f"tokens_tf_idf_{doc_id}.txt")
         output_lemmas_file = os.path.join(lemmas_dir, f"lemmas_tf_idf_{doc_id}.txt")
 
-        result_tokens = ""
-        result_lemmas = ""
-
-        for key in tf_tokens.keys():
-            tf = tf_tokens[key]
-            idf = idf_tokens[key]
-            result_tokens += f"{key} {tf} {idf}\n"
-
-        for key in tf_lemmas.keys():
-            tf = tf_lemmas[key]
-            idf = idf_lemmas[key]
-            result_lemmas += f"{key} {tf} {idf}\n"
-
         with open(output_tokens_file, "w", encoding="utf-8") as file:
-            file.write(result_tokens)
+            file.write(format_row(tf_tokens, row, tokens, idf_tokens))
 
         with open(output_lemmas_file, "w", encoding="utf-8") as file:
-            file.write(result_lemmas)
+            file.write(format_row(tf_lemmas, row, lemmas, idf_lemmas))
 
-        print(f"Сохранен {output_tokens_file} and {output_lemmas_file} для документа {doc_id}")
+    # Те же данные одним артефактом для быстрой загрузки в task_5
+    write_tf_idf_matrix(os.path.join(MATRIX_DIR, "tokens"), tokens, doc_ids, tf_tokens, idf_tokens, count_matrix,
+                        lengths)
+    write_tf_idf_matrix(os.path.join(MATRIX_DIR, "lemmas"), lemmas, doc_ids, tf_lemmas, idf_lemmas, counts_lemmas,
+                        lengths)
 
+    print(f"Сохранены TF и IDF для {len(doc_ids)} документов: {len(tokens)} токенов, {len(lemmas)} лемм")
@@ -0,0 +1,157 @@
+import os
+from collections.abc import Mapping
+
+import numpy as np
+
+
+# Папка с матрицами TF-IDF (по подпапке на уровень: tokens, lemmas)
+MATRIX_DIR = "matrix"
+# Массивы матрицы: словарь терминов, номера документов и CSR-представление (строка - документ)
+MATRIX_ARRAYS = ("vocabulary", "doc_ids", "indptr", "indices", "data")
+# Статистика терминов (по строке на термин словаря): число документов (длина списка документов),
+# число вхождений в коллекцию, IDF и максимальный TF-IDF по документам
+STATISTICS_DTYPE = np.dtype([("df", np.int64), ("cf", np.int64), ("idf", np.float64), ("max_tf_idf", np.float64)])
+# Массивы для BM25: длины документов и списки документов терминов (CSC-представление
+# матрицы числа вхождений: столбец - термин, строки - документы по возрастанию)
+POSTINGS_ARRAYS = ("doc_lengths", "postings_indptr", "postings_rows", "postings_counts")
+# CSC-представление самой матрицы TF-IDF (списки документов терминов с их TF-IDF) для косинусной близости
+COLUMN_ARRAYS = ("columns_indptr", "columns_rows", "columns_data")
+
+
+def write_tf_idf_matrix(directory, terms, doc_ids, tf, idf, counts, lengths):
+    """
+    Сохраняет TF-IDF одного уровня (токены или леммы) набором файлов .npy,
+    которые читаются через отображение в память без разбора и копирования.
+    :param directory: Папка уровня (например, matrix/lemmas).
+    :param terms: Отсортированный список терминов (столбцы матрицы).
+    :param doc_ids: Номера документов (строки матрицы).
+    :param tf: Матрица TF в формате CSR с отсортированными индексами столбцов.
+    :param idf: Массив IDF по столбцам.
+    :param counts: Матрица числа вхождений терминов в документы (той же формы, что tf).
+    :param lengths: Массив длин документов (число токенов).
+    """
+    os.makedirs(directory, exist_ok=True)
+    # TF-IDF = TF * IDF, как при чтении текстовых файлов task_4
+    data = tf.data * np.asarray(idf, dtype=np.float64)[tf.indices]
+    arrays = {
+        "vocabulary": np.array(terms, dtype=str),
+        "doc_ids": np.array(doc_ids, dtype=np.int64),
+        "indptr": tf.indptr.astype(np.int64),
+        "indices": tf.indices.astype(np.int32),
+        "data": data,
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+
+    statistics = np.zeros(len(terms), dtype=STATISTICS_DTYPE)
+    statistics["df"] = np.bincount(tf.indices, minlength=len(terms))
+    statistics["cf"] = np.rint(np.asarray(counts.sum(axis=0)).ravel())
+    statistics["idf"] = idf
+    np.maximum.at(statistics["max_tf_idf"], tf.indices, data)
+    np.save(os.path.join(directory, "statistics.npy"), statistics)
+
+    # Та же матрица TF-IDF по столбцам: запрос читает только списки своих терминов
+    tf_idf = tf.copy()
+    tf_idf.data = data
+    columns = tf_idf.tocsc()
+    columns.sort_indices()
+    arrays = {
+        "columns_indptr": columns.indptr.astype(np.int64),
+        "columns_rows": columns.indices.astype(np.int32),
+        "columns_data": columns.data,
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+
+    # Число вхождений хранится в самом узком подходящем целом типе
+    postings = counts.tocsc()
+    postings.sort_indices()
+    values = np.rint(postings.data).astype(np.int64)
+    arrays = {
+        "doc_lengths": np.asarray(lengths, dtype=np.float64),
+        "postings_indptr": postings.indptr.astype(np.int64),
+        "postings_rows": postings.indices.astype(np.int32),
+        "postings_counts": values.astype(np.min_scalar_type(values.max(initial=0))),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+
+
+def tf_idf_matrix_exists(directory, arrays=MATRIX_ARRAYS):
+    return all(os.path.exists(os.path.join(directory, f"{name}.npy")) for name in arrays)
+
+
+class DocumentVector(Mapping):
+    """
+    Строка матрицы TF-IDF: словарь термин -> TF-IDF только для терминов документа.
+    """
+
+    def __init__(self, matrix, row):
+        self.matrix = matrix
+        self.start = int(matrix.indptr[row])
+        self.end = int(matrix.indptr[row + 1])
+
+    def __getitem__(self, term):
+        column = self.matrix.column(term)
+        if column is not None:
+            indices = self.matrix.indices[self.start:self.end]
+            position = int(np.searchsorted(indices, column))
+            if position < len(indices) and indices[position] == column:
+                return float(self.matrix.data[self.start + position])
+        raise KeyError(term)
+
+    def __iter__(self):
+        return iter(self.matrix.vocabulary[self.matrix.indices[self.start:self.end]].tolist())
+
+    def __len__(self):
+        return self.end - self.start
+
+
+class TfIdfMatrix(Mapping):
+    """
+    Матрица TF-IDF, отображенная в память (mmap). Ведет себя как словарь
+    номер документа -> {термин: TF-IDF}, как результат task_5.main.load_tf_idf;
+    термины ищутся двоичным поиском в отсортированном словаре.
+    """
+
+    def __init__(self, directory):
+        for name in MATRIX_ARRAYS:
+            setattr(self, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+        # Таблица статистики терминов; у матриц, записанных до ее появления, ее нет
+        statistics_file = os.path.join(directory, "statistics.npy")
+        self.statistics = np.load(statistics_file, mmap_mode="r") if os.path.exists(statistics_file) else None
+        # Матрица по столбцам (indptr, строки, TF-IDF) или None у матриц, записанных до ее появления
+        self.columns = None
+        if tf_idf_matrix_exists(directory, COLUMN_ARRAYS):
+            self.columns = tuple(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                                 for name in COLUMN_ARRAYS)
+
+    def column(self, term):
+        """
+        Номер столбца термина или None, если термина нет в словаре.
+        """
+        position = int(np.searchsorted(self.vocabulary, term))
+        if position < len(self.vocabulary) and self.vocabulary[position] == term:
+            return position
+        return None
+
+    def row(self, doc_id):
+        """
+        Номер строки документа или None (номера документов отсортированы).
+        """
+        position = int(np.searchsorted(self.doc_ids, doc_id))
+        if position < len(self.doc_ids) and self.doc_ids[position] == doc_id:
+            return position
+        return None
+
+    def __getitem__(self, doc_id):
+        row = self.row(doc_id)
+        if row is None:
+            raise KeyError(doc_id)
+        return DocumentVector(self, row)
+
+    def __iter__(self):
+        return iter(self.doc_ids.tolist())
+
+    def __len__(self):
+        return len(self.doc_ids)
@@ -0,0 +1,170 @@
+import os
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from task_4.tf_idf_matrix import POSTINGS_ARRAYS
+
+
+# Параметры BM25 по умолчанию: насыщение частоты термина и степень нормирования по длине документа
+K1 = 1.2
+B = 0.75
+
+
+class BM25Field:
+    """
+    Поле документа для BM25F: списки документов терминов с числом вхождений и длины документов.
+    Сейчас индексируется одно поле - текст страницы; заголовки и другие поля добавляются
+    отдельными BM25Field со своим весом.
+    """
+
+    def __init__(self, indptr, rows, counts, lengths, weight=1.0):
+        self.indptr = indptr
+        self.rows = rows
+        self.counts = counts
+        self.lengths = lengths
+        self.average_length = float(np.mean(lengths)) if len(lengths) else 0.0
+        self.weight = weight
+
+    @classmethod
+    def load(cls, directory, weight=1.0):
+        """
+        Загружает поле из массивов, записанных task_4 (write_tf_idf_matrix), через отображение в память.
+        """
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in POSTINGS_ARRAYS}
+        return cls(arrays["postings_indptr"], arrays["postings_rows"], arrays["postings_counts"],
+                   arrays["doc_lengths"], weight)
+
+    def postings(self, column):
+        """
+        Строки документов термина и число вхождений в них.
+        """
+        start, end = self.indptr[column], self.indptr[column + 1]
+        return self.rows[start:end], self.counts[start:end]
+
+
+class BM25Engine:
+    """
+    Ранжирование BM25 (BM25F при нескольких полях) с накоплением оценок по терминам
+    (term-at-a-time): для каждой леммы запроса перебирается только ее список документов,
+    оценки складываются в накопителях документов из этих списков.
+    """
+
+    def __init__(self, doc_ids, vocabulary, df, fields):
+        """
+        :param doc_ids: Массив номеров документов (строки).
+        :param vocabulary: Отсортированный массив терминов (столбцы), термины ищутся в нем двоичным поиском.
+        :param df: Массив числа документов с термином по столбцам.
+        :param fields: Список BM25Field.
+        """
+        self.doc_ids = doc_ids
+        self.vocabulary = vocabulary
+        self.fields = fields
+        # IDF BM25 в неотрицательном варианте: log(1 + (N - df + 0.5) / (df + 0.5))
+        total_docs = len(doc_ids)
+        df = np.asarray(df, dtype=np.float64)
+        self.idf = np.log1p((total_docs - df + 0.5) / (df + 0.5))
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Загружает движок из матрицы уровня task_4 (например, task_4/matrix/lemmas).
+        """
+        doc_ids = np.load(os.path.join(directory, "doc_ids.npy"), mmap_mode="r")
+        vocabulary = np.load(os.path.join(directory, "vocabulary.npy"), mmap_mode="r")
+        statistics = np.load(os.path.join(directory, "statistics.npy"), mmap_mode="r")
+        return cls(doc_ids, vocabulary, statistics["df"], [BM25Field.load(directory)])
+
+    @classmethod
+    def from_counts(cls, documents):
+        """
+        Строит движок в памяти по частотам терминов документов, например по живым документам
+        сегментного индекса (task_3.segments.SegmentedIndex.live_documents): удаленные документы
+        не попадают ни в списки, ни в df, N и среднюю длину.
+        :param documents: Словарь номер документа -> (длина, {термин: число вхождений}).
+        """
+        doc_ids = sorted(documents)
+        terms = sorted({term for _, counts in documents.values() for term in counts})
+        columns = {term: column for column, term in enumerate(terms)}
+        rows = []
+        indices = []
+        values = []
+        for row, doc_id in enumerate(doc_ids):
+            for term, count in documents[doc_id][1].items():
+                rows.append(row)
+                indices.append(columns[term])
+                values.append(count)
+        postings = csr_matrix(
+            (np.array(values, dtype=np.int64), (np.array(rows, dtype=np.int64), np.array(indices, dtype=np.int64))),
+            shape=(len(doc_ids), len(terms)),
+        ).tocsc()
+        postings.sort_indices()
+        lengths = np.array([documents[doc_id][0] for doc_id in doc_ids], dtype=np.float64)
+        field = BM25Field(postings.indptr, postings.indices, postings.data, lengths)
+        return cls(np.array(doc_ids, dtype=np.int64), np.array(terms, dtype=str), np.diff(postings.indptr), [field])
+
+    def column(self, term):
+        """
+        Номер столбца термина или None, если термина нет в словаре.
+        """
+        position = int(np.searchsorted(self.vocabulary, term))
+        if position < len(self.vocabulary) and self.vocabulary[position] == term:
+            return position
+        return None
+
+    def term_scores(self, column, k1, b):
+        """
+        Вклад термина в оценки документов его списков.
+        Частоты полей нормируются по длине и складываются с весами полей (BM25F),
+        затем насыщаются: idf * tf * (k1 + 1) / (tf + k1).
+        :return: Кортеж (строки документов по возрастанию, вклады).
+        """
+        rows = []
+        frequencies = []
+        for field in self.fields:
+            field_rows, counts = field.postings(column)
+            norms = 1 - b + b * field.lengths[field_rows] / field.average_length
+            rows.append(field_rows)
+            frequencies.append(field.weight * counts / norms)
+        if len(self.fields) > 1:
+            rows, frequencies = sum_by_row(np.concatenate(rows), np.concatenate(frequencies))
+        else:
+            rows, frequencies = rows[0], frequencies[0]
+        return rows, self.idf[column] * frequencies * (k1 + 1) / (frequencies + k1)
+
+    def top_k(self, lemmas, top_n=10, k1=K1, b=B):
+        """
+        top_n документов по убыванию оценки BM25, равные - по возрастанию номера строки.
+        В ответ попадают только документы хотя бы с одной леммой запроса.
+        :param lemmas: Леммы запроса (повторы не учитываются).
+        :return: Список пар (номер документа, оценка).
+        """
+        rows = []
+        scores = []
+        for lemma in dict.fromkeys(lemmas):
+            column = self.column(lemma)
+            if column is None:
+                continue
+            term_rows, term_scores = self.term_scores(column, k1, b)
+            rows.append(term_rows)
+            scores.append(term_scores)
+        if not rows or top_n <= 0:
+            return []
+
+        # Накопители: вклады лемм складываются по документам
+        rows, scores = sum_by_row(np.concatenate(rows), np.concatenate(scores))
+        best = np.lexsort((rows, -scores))[:top_n]
+        return list(zip(self.doc_ids[rows[best]].tolist(), scores[best].tolist()))
+
+
+def sum_by_row(rows, values):
+    """
+    Складывает значения с одинаковыми номерами строк (в порядке следования).
+    :return: Кортеж (уникальные строки по возрастанию, суммы).
+    """
+    if len(rows) == 0:
+        return rows, values
+    order = np.argsort(rows, kind="stable")
+    rows, values = rows[order], values[order]
+    starts = np.flatnonzero(np.concatenate(([True], rows[1:] != rows[:-1])))
+    return rows[starts], np.add.reduceat(values, starts)
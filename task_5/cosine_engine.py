@@ -0,0 +1,268 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from task_4.tf_idf_matrix import TfIdfMatrix
+
+
+# Запас оценки сверху на погрешность вычисления близости в числах с плавающей точкой
+BOUND_SLACK = 1e-9
+# Количество строк документов, которые top_k оценивает за один шаг: первые блоки малы, чтобы
+# быстрее набрать порог отсечения, затем блок удваивается до наибольшего размера
+MIN_BLOCK_SIZE = 64
+MAX_BLOCK_SIZE = 16384
+
+
+class CosineEngine:
+    """
+    Косинусная близость запроса к документам по матрице TF-IDF лемм в формате CSC
+    (столбец - список документов леммы), поэтому запрос затрагивает только документы,
+    содержащие его леммы. Матрица task_4 уже записана по столбцам и читается через отображение
+    в память без копирования, леммы ищутся двоичным поиском в ее словаре.
+    Близость считается по измерениям лемм запроса (как прежний перебор документов
+    с sklearn cosine_similarity): векторы документов нормируются по этим измерениям,
+    остальные документы получают 0.
+    """
+
+    def __init__(self, tf_idf_data):
+        """
+        :param tf_idf_data: Словарь номер документа -> {лемма: TF-IDF} или TfIdfMatrix.
+        Порядок строк - порядок обхода tf_idf_data, он же порядок равных по близости документов.
+        """
+        if isinstance(tf_idf_data, TfIdfMatrix):
+            self.doc_ids = tf_idf_data.doc_ids
+            self.column = tf_idf_data.column
+            if tf_idf_data.columns is not None:
+                self.indptr, self.rows, self.data = tf_idf_data.columns
+            else:
+                # Матрица, записанная без столбцов, переводится в CSC один раз в памяти
+                matrix = csr_matrix(
+                    (np.asarray(tf_idf_data.data), np.asarray(tf_idf_data.indices), np.asarray(tf_idf_data.indptr)),
+                    shape=(len(tf_idf_data.doc_ids), len(tf_idf_data.vocabulary)),
+                ).tocsc()
+                matrix.sort_indices()
+                self.indptr, self.rows, self.data = matrix.indptr, matrix.indices, matrix.data
+        else:
+            doc_ids = []
+            columns = {}
+            indptr = [0]
+            indices = []
+            data = []
+            for doc_id, doc_vector in tf_idf_data.items():
+                doc_ids.append(doc_id)
+                for term, value in doc_vector.items():
+                    indices.append(columns.setdefault(term, len(columns)))
+                    data.append(value)
+                indptr.append(len(indices))
+            matrix = csr_matrix((data, indices, indptr), shape=(len(doc_ids), len(columns))).tocsc()
+            matrix.sort_indices()
+            self.doc_ids = np.array(doc_ids, dtype=np.int64)
+            self.column = columns.get
+            self.indptr, self.rows, self.data = matrix.indptr, matrix.indices, matrix.data
+
+        # Максимальный TF-IDF каждой леммы - вес леммы в векторе запроса. Берется из таблицы
+        # статистики task_4, без нее считается один раз по столбцам матрицы
+        if isinstance(tf_idf_data, TfIdfMatrix) and tf_idf_data.statistics is not None:
+            self.max_tf_idf = tf_idf_data.statistics["max_tf_idf"]
+        else:
+            self.max_tf_idf = np.zeros(len(self.indptr) - 1)
+            columns = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+            np.maximum.at(self.max_tf_idf, columns, self.data)
+
+        # Счетчики top_k: документы со списками лемм запроса, для которых близость посчитана и пропущена
+        self.scored = 0
+        self.skipped = 0
+
+    def query_vector(self, lemmas):
+        """
+        Вектор запроса: максимальный TF-IDF каждой леммы по документам (0 для неизвестных лемм),
+        без обхода документов.
+        """
+        vector = {}
+        for lemma in lemmas:
+            column = self.column(lemma)
+            vector[lemma] = float(self.max_tf_idf[column]) if column is not None else 0
+        return vector
+
+    def postings(self, term):
+        """
+        Строки документов леммы и их TF-IDF.
+        """
+        column = self.column(term)
+        if column is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        start, end = self.indptr[column], self.indptr[column + 1]
+        return self.rows[start:end], self.data[start:end]
+
+    def similarities(self, query_vector):
+        """
+        Близость документов, содержащих хотя бы одну лемму запроса.
+        :param query_vector: Словарь лемма -> вес в запросе.
+        :return: Кортеж (номера строк документов по возрастанию, массив близостей).
+        """
+        terms = list(query_vector)
+        postings = [self.postings(term) for term in terms]
+        rows = union_rows([rows for rows, _ in postings])
+
+        # Векторы документов по измерениям лемм запроса
+        vectors = np.zeros((len(rows), len(terms)))
+        for column, (term_rows, values) in enumerate(postings):
+            vectors[np.searchsorted(rows, term_rows), column] = values
+
+        # Нормирование и скалярное произведение - те же операции numpy, что в sklearn cosine_similarity:
+        # произведение считается отдельно для каждого документа (стопка матриц 1 x k на k x 1),
+        # общее матрично-векторное произведение отличается в последнем знаке и меняет порядок равных
+        query = normalize(np.array([[query_vector[term] for term in terms]], dtype=np.float64))
+        vectors = normalize(vectors)
+        scores = np.matmul(vectors[:, np.newaxis, :], query.T)[:, 0, 0]
+        return rows, scores
+
+    def top_k_exhaustive(self, query_vector, top_n=10):
+        """
+        top_n документов по убыванию близости с расчетом близости всех документов со списками лемм запроса;
+        равные - в порядке строк, как при устойчивой сортировке всех документов по убыванию близости.
+        :return: Список пар (номер документа, близость).
+        """
+        rows, scores = self.similarities(query_vector)
+        positive = scores > 0
+        rows, scores = rows[positive], scores[positive]
+        order = np.lexsort((rows, -scores))[:top_n]
+        ranked = list(zip(self.doc_ids[rows[order]].tolist(), scores[order].tolist()))
+        return self.pad_with_zeros(ranked, set(rows.tolist()), top_n)
+
+    def top_k(self, query_vector, top_n=10):
+        """
+        top_n документов алгоритмом MaxScore. Документы обходятся по возрастанию строки блоками
+        (от MIN_BLOCK_SIZE до MAX_BLOCK_SIZE строк), лучшие хранятся в ограниченном списке из top_n документов,
+        а документы, которые по оценке сверху не превзойдут худший из них, пропускаются
+        без расчета близости. Результат совпадает с top_k_exhaustive.
+        :return: Список пар (номер документа, близость).
+        """
+        if top_n <= 0:
+            return []
+        terms = list(query_vector)
+        query = normalize(np.array([[query_vector[term] for term in terms]], dtype=np.float64))
+        postings = [self.postings(term) for term in terms]
+
+        # Оценка сверху: близость документа, в котором есть только леммы S из запроса, не больше
+        # длины нормированного вектора запроса по измерениям S (неравенство Коши-Буняковского),
+        # поэтому оценкой служит корень из суммы квадратов весов лемм документа
+        bounds = query[0] ** 2
+        # Леммы по возрастанию оценки; первые essential_start из них - неосновные: документ
+        # только с ними не может попасть в ответ, поэтому кандидаты берутся из списков основных лемм
+        order = np.argsort(bounds, kind="stable").tolist()
+        prefix_bounds = np.cumsum(bounds[order]).tolist()
+        essential_start = 0
+
+        positions = [0] * len(terms)
+        top_rows = np.empty(0, dtype=np.int64)
+        top_scores = np.empty(0)
+        threshold = 0.0
+        scored = 0
+        block_size = MIN_BLOCK_SIZE
+        while True:
+            essential = order[essential_start:]
+            # Следующий блок начинается с первого непросмотренного документа основных лемм
+            block_start = min(
+                (int(postings[column][0][positions[column]]) for column in essential
+                 if positions[column] < len(postings[column][0])),
+                default=None,
+            )
+            if block_start is None:
+                break
+            block_end = block_start + block_size
+            block_size = min(block_size * 2, MAX_BLOCK_SIZE)
+
+            ends = [
+                positions[column] + int(np.searchsorted(rows[positions[column]:], block_end))
+                for column, (rows, _) in enumerate(postings)
+            ]
+            candidates = union_rows([postings[column][0][positions[column]:ends[column]] for column in essential])
+
+            # Веса лемм кандидатов: поиск кандидатов в частях списков, попадающих в блок
+            vectors = np.zeros((len(candidates), len(terms)))
+            present = np.zeros((len(candidates), len(terms)), dtype=bool)
+            for column, (rows, data) in enumerate(postings):
+                block_rows = rows[positions[column]:ends[column]]
+                if len(block_rows) == 0:
+                    continue
+                found = np.searchsorted(block_rows, candidates)
+                hit = found < len(block_rows)
+                hit[hit] = block_rows[found[hit]] == candidates[hit]
+                vectors[hit, column] = data[positions[column] + found[hit]]
+                present[hit, column] = True
+            positions = ends
+
+            # Кандидаты, которые по оценке не превзойдут худший документ ответа, не считаются
+            keep = upper_bound(present @ bounds) > threshold
+            candidates, vectors = candidates[keep], vectors[keep]
+            if len(candidates) == 0:
+                continue
+            scored += len(candidates)
+            scores = np.matmul(normalize(vectors)[:, np.newaxis, :], query.T)[:, 0, 0]
+
+            # Ответ - top_n по убыванию близости, равные - по возрастанию строки. Кандидаты блока идут
+            # после уже найденных документов, поэтому пропущенный документ, равный худшему, в ответ не попал бы
+            positive = scores > 0
+            top_rows = np.concatenate([top_rows, candidates[positive]])
+            top_scores = np.concatenate([top_scores, scores[positive]])
+            best = np.lexsort((top_rows, -top_scores))[:top_n]
+            top_rows, top_scores = top_rows[best], top_scores[best]
+            if len(top_rows) == top_n:
+                threshold = float(top_scores[-1])
+                while essential_start < len(order) and upper_bound(prefix_bounds[essential_start]) <= threshold:
+                    essential_start += 1
+
+        # Документы со списками лемм запроса - объединение списков (без массива на весь корпус)
+        candidates = len(union_rows([rows for rows, _ in postings]))
+        self.scored += scored
+        self.skipped += candidates - scored
+
+        ranked = list(zip(self.doc_ids[top_rows].tolist(), top_scores.tolist()))
+        return self.pad_with_zeros(ranked, set(top_rows.tolist()), top_n)
+
+    def pad_with_zeros(self, ranked, ranked_rows, top_n):
+        """
+        Дополняет ответ до top_n документами с нулевой близостью в порядке строк.
+        Перебираются только первые строки: не больше top_n + len(ranked_rows).
+        """
+        if len(ranked) >= top_n:
+            return ranked
+        for row in range(len(self.doc_ids)):
+            if len(ranked) >= top_n:
+                break
+            if row not in ranked_rows:
+                ranked.append((int(self.doc_ids[row]), 0.0))
+        return ranked
+
+    def stats(self):
+        total = self.scored + self.skipped
+        return {
+            "scored": self.scored,
+            "skipped": self.skipped,
+            "skip_rate": self.skipped / total if total else 0,
+        }
+
+
+def union_rows(arrays):
+    """
+    Отсортированное объединение отсортированных массивов номеров строк.
+    """
+    if not arrays:
+        return np.empty(0, dtype=np.int64)
+    rows = np.sort(np.concatenate(arrays))
+    if len(rows) == 0:
+        return rows
+    return rows[np.concatenate(([True], rows[1:] != rows[:-1]))]
+
+
+def upper_bound(squared_bound):
+    return np.sqrt(np.maximum(squared_bound, 0.0)) * (1 + BOUND_SLACK)
+
+
+def normalize(vectors):
+    """
+    Нормирует строки по длине (нулевые строки остаются нулевыми), как sklearn.preprocessing.normalize.
+    """
+    norms = np.sqrt(np.einsum("ij,ij->i", vectors, vectors))
+    norms[norms == 0] = 1
+    return vectors / norms[:, np.newaxis]
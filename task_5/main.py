@@ -1,22 +1,24 @@
 import os
-import json
-import re
 from collections import defaultdict
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from task_2.main import tokenize, filter_tokens, delete_duplicates, group_by_lemmas
+from task_3.binary_index import load_inverted_index
+from task_3.segments import MANIFEST_FILE, SegmentedIndex
+from task_4.tf_idf_matrix import POSTINGS_ARRAYS, TfIdfMatrix, tf_idf_matrix_exists
+from task_5.bm25_engine import B, K1, BM25Engine
+from task_5.cosine_engine import CosineEngine
 
 # Пути к папкам
 HTML_DIR = "task_1/pages"
 TOKENS_DIR = "task_2/tokens"
 LEMMAS_DIR = "task_2/lemmas"
 INVERTED_INDEX_FILE = "task_3/inverted_index.json"
-TF_IDF_TOKENS_DIR = "task_4/tokens"
+INVERTED_INDEX_BIN = "task_3/inverted_index.bin"
 TF_IDF_LEMMAS_DIR = "task_4/lemmas"
+TF_IDF_MATRIX_DIR = "task_4/matrix"
+SEGMENTS_DIR = "task_3/segments"
 
-# Загрузка инвертированного списка
-with open(INVERTED_INDEX_FILE, "r", encoding="utf-8") as f:
-    inverted_index = json.load(f)
+# Загрузка инвертированного списка (двоичный индекс, если он построен, иначе JSON)
+inverted_index = load_inverted_index(INVERTED_INDEX_FILE, INVERTED_INDEX_BIN)
 
 
 # Загрузка TF-IDF для токенов
@@ -33,15 +35,35 @@ def load_tf_idf(directory):
     return tf_idf_data
 
 
-tf_idf_tokens = load_tf_idf(TF_IDF_TOKENS_DIR)
-tf_idf_lemmas = load_tf_idf(TF_IDF_LEMMAS_DIR)
+# Ранжирование BM25 доступно, если task_4 записал списки документов с числом вхождений или построен сегментный индекс
+bm25_engine = None
+
+# Если построен сегментный индекс, TF-IDF и BM25 считаются по живым документам его сегментов
+if os.path.exists(os.path.join(SEGMENTS_DIR, MANIFEST_FILE)):
+    segmented_index = SegmentedIndex(SEGMENTS_DIR)
+    tf_idf_lemmas = segmented_index.tf_idf("lemmas")
+    bm25_engine = BM25Engine.from_counts({
+        doc_id: (length, lemma_counts)
+        for doc_id, (length, _, lemma_counts) in segmented_index.live_documents().items()
+    })
+# Матрицы TF-IDF из task_4 отображаются в память без разбора текстовых файлов
+elif tf_idf_matrix_exists(os.path.join(TF_IDF_MATRIX_DIR, "lemmas")):
+    tf_idf_lemmas = TfIdfMatrix(os.path.join(TF_IDF_MATRIX_DIR, "lemmas"))
+    if tf_idf_matrix_exists(os.path.join(TF_IDF_MATRIX_DIR, "lemmas"), POSTINGS_ARRAYS):
+        bm25_engine = BM25Engine.load(os.path.join(TF_IDF_MATRIX_DIR, "lemmas"))
+else:
+    tf_idf_lemmas = load_tf_idf(TF_IDF_LEMMAS_DIR)
+
+# Матрица лемм для расчета близости только по документам с леммами запроса
+cosine_engine = CosineEngine(tf_idf_lemmas)
 
 
 def preprocess_query(query, lemmas_dir=LEMMAS_DIR):
     tokens = tokenize(query)
 
+    # Сортируем, чтобы порядок лемм запроса (и последние знаки близости) не зависел от порядка множества
     filtered_tokens = filter_tokens(tokens)
-    filtered_tokens = delete_duplicates(filtered_tokens)
+    filtered_tokens = sorted(delete_duplicates(filtered_tokens))
 
     # Находим леммы для токенов
     lemmas_dict = group_by_lemmas(filtered_tokens)
@@ -49,51 +71,31 @@ def preprocess_query(query, lemmas_dir=LEMMAS_DIR):
     return lemmas_dict
 
 
-def query_to_vector(query, tf_idf_data):
-    query_vector = {}
-
-    # Проходим по всем леммам из запроса
-    for lemma in query:
-        max_tf_idf = max(
-            tf_idf_data[doc].get(lemma, 0) for doc in tf_idf_data
-        )
-        query_vector[lemma] = max_tf_idf
-
-    return query_vector
-
-
-def calculate_relevance(query_vector, tf_idf_data):
-    similarities = {}
-    for doc_id, doc_vector in tf_idf_data.items():
-        # Создаем вектор документа
-        doc_vec = np.array([doc_vector.get(term, 0) for term in query_vector])
-        query_vec = np.array([query_vector[term] for term in query_vector])
-
-        # Вычисляем косинусную близость
-        similarity = cosine_similarity([query_vec], [doc_vec])[0][0]
-        similarities[doc_id] = similarity
-
-    return similarities
-
-
-def rank_documents(similarities, top_n=5):
-    ranked_docs = sorted(similarities.items(), key=lambda x: x[1], reverse=True)
-    return ranked_docs[:top_n]
-
-
-def browse_documents(query, top_n=10):
+def browse_documents(query, top_n=10, mode="cosine", k1=K1, b=B):
+    """
+    Поиск документов по запросу.
+    :param mode: Ранжирование: "cosine" - косинусная близость TF-IDF, "bm25" - BM25.
+    :param k1: Параметр k1 BM25 (насыщение частоты леммы).
+    :param b: Параметр b BM25 (нормирование по длине документа).
+    :return: Список словарей {"doc_num", "score"} по убыванию релевантности.
+    """
     lemmas_dict = preprocess_query(query)
 
     query_lemmas = list(lemmas_dict.keys())
 
-    # Преобразование запроса в вектор
-    query_vector = query_to_vector(query_lemmas, tf_idf_lemmas)
-
-    # Расчет релевантности
-    similarities = calculate_relevance(query_vector, tf_idf_lemmas)
+    if mode == "bm25":
+        if bm25_engine is None:
+            raise ValueError("Для BM25 нужна матрица task_4/matrix со списками документов (запустите task_4) "
+                             "или сегментный индекс task_3/segments")
+        ranked_docs = bm25_engine.top_k(query_lemmas, top_n, k1, b)
+    elif mode == "cosine":
+        # Преобразование запроса в вектор (веса лемм - из таблицы статистики)
+        query_vector = cosine_engine.query_vector(query_lemmas)
 
-    # Ранжирование документов
-    ranked_docs = rank_documents(similarities, top_n=10)
+        # Расчет релевантности и ранжирование документов
+        ranked_docs = cosine_engine.top_k(query_vector, top_n=top_n)
+    else:
+        raise ValueError(f"Неизвестный режим ранжирования: {mode}")
 
     result = []
     for doc in ranked_docs:
@@ -118,14 +120,11 @@ for query in query_examples:
 
     query_lemmas = list(lemmas_dict.keys())
 
-    # Преобразование запроса в вектор
-    query_vector = query_to_vector(query_lemmas, tf_idf_lemmas)
-
-    # Расчет релевантности
-    similarities = calculate_relevance(query_vector, tf_idf_lemmas)
+    # Преобразование запроса в вектор (веса лемм - из таблицы статистики)
+    query_vector = cosine_engine.query_vector(query_lemmas)
 
-    # Ранжирование документов
-    ranked_docs = rank_documents(similarities, top_n=10)
+    # Расчет релевантности и ранжирование документов
+    ranked_docs = cosine_engine.top_k(query_vector, top_n=10)
 
     # Вывод результатов
     results += f"Запрос: {query}\n"
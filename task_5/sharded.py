@@ -0,0 +1,229 @@
+"""
+Шардированный индекс: документы делятся на шарды по номеру (doc_id % число шардов),
+у каждого шарда свои списки документов и TF лемм. Координатор рассылает запрос
+процессам шардов (по одному процессу на шард) и объединяет ответы: для булева поиска -
+объединение множеств документов, для векторного - общий топ-k по глобальной статистике
+(idf по суммарному df и максимальному TF-IDF леммы по всем шардам).
+
+Пример: python -m task_5.sharded --build --shards 4
+        python -m task_5.sharded --query "гермиона рон" --boolean "гарри and not рон"
+"""
+import argparse
+import heapq
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from task_2.main import tokenize, filter_tokens, delete_duplicates, group_by_lemmas
+from task_3.binary_index import BinaryIndexReader, load_inverted_index, write_binary_index
+from task_3.main import boolean_search
+from task_5.cosine_engine import CosineEngine
+
+# Пути к папкам
+TOKENS_DIR = "task_2/tokens"
+INVERTED_INDEX_FILE = "task_3/inverted_index.json"
+INVERTED_INDEX_BIN = "task_3/inverted_index.bin"
+TF_IDF_LEMMAS_DIR = "task_4/lemmas"
+SHARDS_DIR = "task_5/shards"
+SHARDS_FILE = "shards.json"
+
+# Количество шардов по умолчанию
+NUM_SHARDS = 4
+
+
+def build_shards(num_shards=NUM_SHARDS, shards_dir=SHARDS_DIR):
+    """
+    Делит документы на шарды: shard_{k}/inverted_index.bin - списки документов шарда,
+    shard_{k}/lemmas.json - TF лемм документов шарда (из task_4).
+    :param num_shards: Количество шардов.
+    :param shards_dir: Папка для шардов.
+    """
+    inverted_index = load_inverted_index(INVERTED_INDEX_FILE, INVERTED_INDEX_BIN)
+
+    shard_postings = [{} for _ in range(num_shards)]
+    for term in inverted_index:
+        for doc_id in inverted_index[term]:
+            shard_postings[doc_id % num_shards].setdefault(term, set()).add(doc_id)
+
+    shard_lemmas = [{} for _ in range(num_shards)]
+    for filename in os.listdir(TF_IDF_LEMMAS_DIR):
+        if not filename.endswith(".txt"):
+            continue
+        doc_id = int(filename.split("_")[3].split(".")[0])
+        tf = {}
+        with open(os.path.join(TF_IDF_LEMMAS_DIR, filename), "r", encoding="utf-8") as file:
+            for line in file:
+                lemma, lemma_tf, _ = line.split()
+                tf[lemma] = float(lemma_tf)
+        shard_lemmas[doc_id % num_shards][doc_id] = tf
+
+    for shard in range(num_shards):
+        shard_dir = os.path.join(shards_dir, f"shard_{shard}")
+        os.makedirs(shard_dir, exist_ok=True)
+        write_binary_index(shard_postings[shard], os.path.join(shard_dir, "inverted_index.bin"))
+        with open(os.path.join(shard_dir, "lemmas.json"), "w", encoding="utf-8") as file:
+            json.dump({str(doc_id): tf for doc_id, tf in sorted(shard_lemmas[shard].items())},
+                      file, ensure_ascii=False, separators=(",", ":"))
+
+    with open(os.path.join(shards_dir, SHARDS_FILE), "w", encoding="utf-8") as file:
+        json.dump({"num_shards": num_shards, "total_docs": len(os.listdir(TOKENS_DIR))}, file)
+
+
+# Состояние процесса шарда: заполняется init_shard при запуске процесса
+shard_state = {}
+
+
+def init_shard(shard_dir, shard, num_shards):
+    shard_state["shard"] = shard
+    shard_state["num_shards"] = num_shards
+    shard_state["inverted_index"] = BinaryIndexReader(os.path.join(shard_dir, "inverted_index.bin"))
+    with open(os.path.join(shard_dir, "lemmas.json"), "r", encoding="utf-8") as file:
+        shard_state["lemmas"] = {int(doc_id): tf for doc_id, tf in json.load(file).items()}
+
+
+def shard_statistics():
+    """
+    Локальная статистика шарда: число документов и df лемм.
+    """
+    df = {}
+    for tf in shard_state["lemmas"].values():
+        for lemma in tf:
+            df[lemma] = df.get(lemma, 0) + 1
+    return len(shard_state["lemmas"]), df
+
+
+def init_engine(idf):
+    """
+    Строит матрицу TF-IDF шарда по глобальному idf (CosineEngine в формате CSC): запрос затрагивает
+    только списки документов своих лемм, максимальный TF-IDF лемм считается один раз.
+    Строки - документы шарда по возрастанию номера, равные по близости документы упорядочиваются по номеру.
+    """
+    lemmas = shard_state.pop("lemmas")
+    shard_state["engine"] = CosineEngine({
+        doc_id: {lemma: lemma_tf * idf[lemma] for lemma, lemma_tf in tf.items()}
+        for doc_id, tf in sorted(lemmas.items())
+    })
+
+
+def shard_max_tf_idf(lemmas):
+    """
+    Максимальный TF-IDF каждой леммы в документах шарда (из статистики матрицы шарда).
+    """
+    return shard_state["engine"].query_vector(lemmas)
+
+
+def shard_top_k(query_vector, top_n):
+    """
+    Косинусная близость документов шарда к вектору запроса (по измерениям лемм запроса).
+    :return: top_n пар (номер документа, релевантность) по убыванию релевантности.
+    """
+    return shard_state["engine"].top_k(query_vector, top_n)
+
+
+def shard_boolean_search(query, total_docs, engine):
+    """
+    Булев поиск по документам шарда. NOT вычисляется относительно документов range(total_docs),
+    попадающих в шард, поэтому объединение ответов шардов совпадает с поиском по всему индексу.
+    """
+    shard, num_shards = shard_state["shard"], shard_state["num_shards"]
+    live_docs = set(range(shard, total_docs, num_shards))
+    return boolean_search(query, shard_state["inverted_index"], total_docs, engine=engine, live_docs=live_docs)
+
+
+class ShardedSearch:
+    """
+    Координатор поиска по шардам. Каждый шард обслуживает отдельный процесс,
+    в котором данные шарда загружены один раз; взаимодействие - только вызовы функций
+    shard_*, поэтому шарды можно вынести на отдельные машины, не меняя интерфейса.
+    """
+
+    def __init__(self, shards_dir=SHARDS_DIR):
+        with open(os.path.join(shards_dir, SHARDS_FILE), "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        self.num_shards = meta["num_shards"]
+        self.total_docs = meta["total_docs"]
+        self.executors = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                initializer=init_shard,
+                initargs=(os.path.join(shards_dir, f"shard_{shard}"), shard, self.num_shards),
+            )
+            for shard in range(self.num_shards)
+        ]
+
+        # Глобальная статистика: idf = log(N / df) по всем шардам, как в task_3/lemma_index.json
+        total_docs = 0
+        df = {}
+        for shard_docs, shard_df in self.scatter(shard_statistics):
+            total_docs += shard_docs
+            for lemma, lemma_df in shard_df.items():
+                df[lemma] = df.get(lemma, 0) + lemma_df
+        self.idf = {lemma: math.log(total_docs / lemma_df) for lemma, lemma_df in df.items()}
+        self.scatter(init_engine, self.idf)
+
+    def scatter(self, function, *args):
+        """
+        Вызывает функцию во всех шардах параллельно и возвращает ответы в порядке шардов.
+        """
+        futures = [executor.submit(function, *args) for executor in self.executors]
+        return [future.result() for future in futures]
+
+    def close(self):
+        for executor in self.executors:
+            executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def boolean_search(self, query, engine="set"):
+        """
+        Булев поиск по всем шардам.
+        :return: Множество ID документов.
+        """
+        result = set()
+        for shard_result in self.scatter(shard_boolean_search, query, self.total_docs, engine):
+            result.update(shard_result)
+        return result
+
+    def browse_documents(self, query, top_n=10):
+        """
+        Векторный поиск по всем шардам, формат ответа как у task_5.main.browse_documents.
+        """
+        # Сортируем, как task_5.main.preprocess_query: порядок лемм запроса не зависит от порядка множества
+        tokens = sorted(delete_duplicates(filter_tokens(tokenize(query))))
+        lemmas = list(group_by_lemmas(tokens).keys())
+
+        # Вектор запроса: максимальный TF-IDF леммы по всем документам
+        query_vector = {lemma: 0 for lemma in lemmas}
+        for shard_max in self.scatter(shard_max_tf_idf, lemmas):
+            for lemma, max_tf_idf in shard_max.items():
+                query_vector[lemma] = max(query_vector[lemma], max_tf_idf)
+
+        shard_results = self.scatter(shard_top_k, query_vector, top_n)
+        ranked_docs = list(heapq.merge(*shard_results, key=lambda item: (-item[1], item[0])))[:top_n]
+        return [{"doc_num": doc_id, "score": round(score, 4)} for doc_id, score in ranked_docs]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Поиск по шардированному индексу")
+    parser.add_argument("--build", action="store_true", help="построить шарды по результатам task_3 и task_4")
+    parser.add_argument("--shards", type=int, default=NUM_SHARDS, help="количество шардов")
+    parser.add_argument("--query", help="запрос для векторного поиска")
+    parser.add_argument("--boolean", help="запрос для булева поиска")
+    parser.add_argument("--top-n", type=int, default=10, help="количество документов в ответе")
+    args = parser.parse_args()
+
+    if args.build:
+        build_shards(args.shards)
+
+    if args.query or args.boolean:
+        with ShardedSearch() as search:
+            if args.query:
+                for doc in search.browse_documents(args.query, args.top_n):
+                    print(f"Документ {doc['doc_num']}: релевантность = {doc['score']:.4f}")
+            if args.boolean:
+                print(f"Документы: {', '.join(map(str, sorted(search.boolean_search(args.boolean.lower()))))}")